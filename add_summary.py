@@ -1,37 +1,50 @@
 import pandas as pd 
 import argparse 
-from group_variants import variants
-
-def main(report, file):
-    summaries = []
-    # add summary for each variant describing pathogenicity predictions and gnomad frequency
-    for index, variant in report.iterrows():
-        try:
-            summary = variants.summary_field(variant['Cadd_score'], variant['Sift_score'], variant['Polyphen_score'], variant['Vest3_score'],
-                                variant['Revel_score'], variant['Gnomad_ac'], variant['Gnomad_hom'], variant['Refseq_change'],
-                                variant['Variation'], variant['Gene'], variant['C4R_WES_counts'], variant['Quality'], variant['Exac_pli_score'])
-        except KeyError:
-            summary = variants.summary_field(variant['Cadd_score'], variant['Sift_score'], variant['Polyphen_score'], variant['Vest3_score'],
-                    variant['Revel_score'], variant['Gnomad_ac'], variant['Gnomad_hom'], variant['Refseq_change'],
-                    variant['Variation'], variant['Gene'], variant['Frequency_in_C4R'], variant['Quality'], variant['Exac_pli_score'])
-
-        summaries.append(summary)
-    report['Summary'] = summaries
-    cols = list(report.columns)
-    cols = [cols[-1]] + cols[:-1]
-    report = report[cols]
-
-
-    report.to_csv('%s_with_summaries.csv' % file, index=False, encoding="ISO-8859-1")
+from group_variants import variants, reader, cache, timing, scores
+
+def main(report, file, timer=None):
+    if timer is None:
+        timer = timing.StageTimer()
+
+    # report is either a DataFrame or an iterator of DataFrame chunks
+    if isinstance(report, pd.DataFrame):
+        report = [report]
+
+    header = True
+    for chunk in report:
+        # add summary for each variant describing pathogenicity predictions and gnomad frequency
+        # (reports read through the cache already have one)
+        with timer.stage('summary', len(chunk)) as stage:
+            if 'Summary' not in chunk.columns:
+                chunk['Summary'] = variants.summary_fields(chunk)
+                cols = list(chunk.columns)
+                cols = [cols[-1]] + cols[:-1]
+                chunk = chunk[cols]
+            stage.rows_out = (stage.rows_out or 0) + len(chunk)
+
+        with timer.stage('write', len(chunk)):
+            scores.display(chunk, as_text=True).to_csv('%s_with_summaries.csv' % file, index=False, encoding="ISO-8859-1",
+                         header=header, mode='w' if header else 'a')
+        header = False
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Generates summary column from raw variant report')
     parser.add_argument('-report', type=str, help='input report csv')
+    parser.add_argument('-chunksize', type=int, help='number of variants to process at a time', default=100000)
+    parser.add_argument('-cache_dir', type=str, help='directory to cache parsed reports in, shared by all scripts', default=None)
+    parser.add_argument('-timings', action='store_true', help='write per-stage time, memory and row counts to a .timings.json file next to the output')
     args = parser.parse_args()
 
-    file = args.report.strip('.csv')
-    report = pd.read_csv(args.report, encoding="ISO-8859-1")
-    main(report, file)
-
-    
\ No newline at end of file
+    timer = timing.StageTimer(args.timings)
+    file = reader.report_name(args.report)
+    if args.cache_dir:
+        with timer.stage('read') as stage:
+            report = cache.read_report(args.report, args.cache_dir, summary=True)
+            stage.rows_out = len(report)
+    else:
+        report = timer.iterate('read', reader.read_report(args.report, chunksize=args.chunksize))
+    main(report, file, timer)
+    timer.write('%s_with_summaries.timings.json' % file)
+
+    
@@ -0,0 +1,144 @@
+import argparse
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from group_variants import reader, cache
+import prioritize_variants
+import filter_for_genome_rounds
+
+# manifest columns; maternal_id, paternal_id and panel may be left blank
+MANIFEST_COLUMNS = [
+    "report",
+    "family_id",
+    "proband_id",
+    "maternal_id",
+    "paternal_id",
+    "report_type",
+    "panel",
+]
+
+
+def read_manifest(path):
+    manifest = pd.read_csv(path, dtype=str, keep_default_na=False)
+    missing = [column for column in MANIFEST_COLUMNS if column not in manifest.columns]
+    if missing:
+        raise ValueError("manifest %s is missing columns: %s" % (path, ", ".join(missing)))
+    return manifest.to_dict("records")
+
+
+def run_family(family, script, cache_dir):
+    """
+    Runs one family's report in a worker process. Errors are caught and returned
+    in the result so one bad report does not stop the batch.
+    """
+    start = time.time()
+    result = {"family_id": family["family_id"], "report": family["report"]}
+    try:
+        if script == "prioritize":
+            # output names follow prioritize_variants.py and filter_for_genome_rounds.py
+            file = reader.report_name(family["report"])
+            report = cache.read_report(family["report"], cache_dir, summary=False)
+            prioritize_variants.main(
+                report,
+                family["proband_id"],
+                family["report_type"],
+                family["family_id"],
+                file,
+                family["maternal_id"] or None,
+                family["paternal_id"] or None,
+                family["panel"].lower() in ["true", "1", "yes"],
+            )
+        else:
+            file = family["report"].replace(".tsv", "")
+            if cache_dir:
+                report = cache.read_report(family["report"], cache_dir, summary=True)
+            else:
+                report = reader.read_report(family["report"], chunksize=100000)
+            filter_for_genome_rounds.main(report, file)
+        result["status"] = "ok"
+        result["error"] = ""
+    except Exception:
+        result["status"] = "failed"
+        result["error"] = traceback.format_exc().strip().splitlines()[-1]
+    result["seconds"] = round(time.time() - start, 2)
+    return result
+
+
+def main(manifest, script, processes, cache_dir, summary):
+    families = read_manifest(manifest)
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {
+            executor.submit(run_family, family, script, cache_dir): family for family in families
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # the worker itself died, e.g. killed for running out of memory,
+                # which also fails the families still queued on the pool
+                family = futures[future]
+                result = {
+                    "family_id": family["family_id"],
+                    "report": family["report"],
+                    "status": "failed",
+                    "error": traceback.format_exception_only(e)[-1].strip(),
+                    "seconds": float("nan"),
+                }
+            print(
+                "%s: %s in %ss %s"
+                % (result["family_id"], result["status"], result["seconds"], result["error"])
+            )
+            results.append(result)
+
+    results = pd.DataFrame(
+        results, columns=["family_id", "report", "status", "seconds", "error"]
+    )
+    results.to_csv(summary, index=False)
+    failed = (results["status"] == "failed").sum()
+    print(
+        "%d families processed, %d failed, %.1fs total report time; summary written to %s"
+        % (len(results), failed, results["seconds"].sum(), summary)
+    )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Runs prioritize_variants or filter_for_genome_rounds over every family in a manifest csv"
+    )
+    parser.add_argument(
+        "-manifest",
+        type=str,
+        help="csv with columns %s" % ", ".join(MANIFEST_COLUMNS),
+    )
+    parser.add_argument(
+        "-script",
+        type=str,
+        help="prioritize or genome_rounds, default prioritize",
+        choices=["prioritize", "genome_rounds"],
+        default="prioritize",
+    )
+    parser.add_argument(
+        "-processes",
+        type=int,
+        help="number of families to process at once, default number of cpus",
+        default=os.cpu_count(),
+    )
+    parser.add_argument(
+        "-cache_dir",
+        type=str,
+        help="directory to cache parsed reports in, shared by all scripts",
+        default=None,
+    )
+    parser.add_argument(
+        "-summary",
+        type=str,
+        help="csv to write per-family status and timings to",
+        default="batch_summary.csv",
+    )
+    args = parser.parse_args()
+
+    main(args.manifest, args.script, args.processes, args.cache_dir, args.summary)
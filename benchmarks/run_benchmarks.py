@@ -0,0 +1,173 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+from group_variants import variants, reader, writer
+import prioritize_variants
+import synthetic_report
+
+
+def timed(results, size, report_type, stage, function, *args):
+    start = time.perf_counter()
+    output = function(*args)
+    seconds = time.perf_counter() - start
+    rows_out = len(output) if isinstance(output, (pd.DataFrame, pd.Series)) else None
+    results.append(
+        {
+            "rows": size,
+            "report_type": report_type,
+            "stage": stage,
+            "seconds": round(seconds, 4),
+            "rows_out": rows_out,
+        }
+    )
+    print("%9d %-9s %-22s %9.3fs" % (size, report_type, stage, seconds), flush=True)
+    return output
+
+
+def write_workbook(path, tabs):
+    with writer.open_workbook(path) as workbook:
+        for sheet_name, tab in tabs.items():
+            writer.write_frame(workbook, sheet_name, tab)
+
+
+def benchmark(results, workdir, size, report_type, excel):
+    path = os.path.join(workdir, "synthetic_%s_%d.csv" % (report_type, size))
+    if not os.path.exists(path):
+        synthetic_report.make_report(path, size, report_type)
+
+    family_id = synthetic_report.FAMILY_ID
+    proband = variants.parse_id(family_id, synthetic_report.PROBAND_ID)
+    mother = father = None
+    if report_type == "trio":
+        mother = variants.parse_id(family_id, synthetic_report.MATERNAL_ID)
+        father = variants.parse_id(family_id, synthetic_report.PATERNAL_ID)
+
+    report = timed(results, size, report_type, "load", reader.read_report, path)
+    # in-memory size of the loaded report, to track the dtype schema
+    results[-1]["frame_mb"] = round(report.memory_usage(deep=True).sum() / 2**20, 1)
+    timed(results, size, report_type, "summary", variants.summary_fields, report)
+    timed(results, size, report_type, "classify", variants.classify, report, proband, mother, father, report_type)
+
+    # each filter on its own, including the classification it needs
+    filters = [
+        ("autosomal_recessive", variants.autosomal_recessive, (proband, mother, father, report_type)),
+        ("compound_het", variants.compound_het, (proband, mother, father, report_type)),
+        ("hemizygous", variants.hemizygous, (proband, mother, father, report_type)),
+        ("dominant_OMIM", variants.dominant_OMIM, (proband,)),
+        ("panel", variants.panel, (proband,)),
+    ]
+    if report_type == "trio":
+        filters.append(("denovo", variants.denovo, (proband, mother, father)))
+    else:
+        filters.append(("dominant_nonOMIM", variants.dominant_nonOMIM, (proband,)))
+    for stage, function, args in filters:
+        timed(results, size, report_type, stage, function, report, *args)
+
+    tabs = timed(
+        results,
+        size,
+        report_type,
+        "prioritize",
+        prioritize_variants.prioritize,
+        report,
+        synthetic_report.PROBAND_ID,
+        report_type,
+        family_id,
+        synthetic_report.MATERNAL_ID if report_type == "trio" else None,
+        synthetic_report.PATERNAL_ID if report_type == "trio" else None,
+    )
+    if excel:
+        xlsx = os.path.join(workdir, "synthetic_%s_%d" % (report_type, size))
+        timed(results, size, report_type, "write_tabs", write_workbook, xlsx + "_formatted.xlsx", tabs)
+        timed(results, size, report_type, "write_all", write_workbook, xlsx + "_all.xlsx", {"all": report})
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "-C", REPO, "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {
+        (result["rows"], result["report_type"], result["stage"]): result["seconds"]
+        for result in baseline["results"]
+    }
+    print("\ncompared to %s (commit %s):" % (baseline_path, baseline.get("commit")))
+    for result in results:
+        key = (result["rows"], result["report_type"], result["stage"])
+        if key in previous and previous[key] > 0:
+            print(
+                "%9d %-9s %-22s %9.3fs -> %9.3fs (%.2fx)"
+                % (key + (previous[key], result["seconds"], previous[key] / max(result["seconds"], 1e-9)))
+            )
+
+
+def main(sizes, report_types, excel, output, workdir, baseline):
+    results = []
+    if workdir is None:
+        workdir = tempfile.mkdtemp(prefix="ngs_reports_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    for report_type in report_types:
+        for size in sizes:
+            benchmark(results, workdir, size, report_type, excel)
+
+    run = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(run, f, indent=2)
+    print("results written to %s" % output)
+    if baseline:
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Times loading, summaries, inheritance filters and Excel writing on synthetic reports"
+    )
+    parser.add_argument(
+        "-sizes",
+        type=str,
+        help="comma separated report sizes in rows, default 1000,100000",
+        default="1000,100000",
+    )
+    parser.add_argument(
+        "-report_types", type=str, help="comma separated, default singleton,trio", default="singleton,trio"
+    )
+    parser.add_argument("-skip_excel", action="store_true", help="do not time Excel writing")
+    parser.add_argument("-output", type=str, help="results json", default="benchmark_results.json")
+    parser.add_argument(
+        "-workdir", type=str, help="directory for generated reports, reused between runs", default=None
+    )
+    parser.add_argument("-compare", type=str, help="earlier results json to compare against", default=None)
+    args = parser.parse_args()
+
+    main(
+        [int(size) for size in args.sizes.split(",")],
+        args.report_types.split(","),
+        not args.skip_excel,
+        args.output,
+        args.workdir,
+        args.compare,
+    )
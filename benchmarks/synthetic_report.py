@@ -0,0 +1,111 @@
+import argparse
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from group_variants import variants
+
+CHROMOSOMES = [str(chromosome) for chromosome in range(1, 23)] + ["X", "Y"]
+CONSEQUENCES = [
+    "missense_variant",
+    "synonymous_variant",
+    "intron_variant",
+    "frameshift_variant",
+    "stop_gained",
+    "splice_donor_variant",
+    "splice_acceptor_variant",
+    "inframe_deletion",
+    "5_prime_UTR_variant",
+]
+ZYGOSITIES = ["Het", "Hom", "-"]
+
+# sample ids used in the generated reports, as passed to the report scripts
+FAMILY_ID = "FAM1"
+PROBAND_ID = "P1"
+MATERNAL_ID = "M1"
+PATERNAL_ID = "D1"
+
+
+def sample_ids(report_type):
+    if report_type == "trio":
+        return [PROBAND_ID, MATERNAL_ID, PATERNAL_ID]
+    return [PROBAND_ID]
+
+
+def scores(rng, n, low, high, sentinels):
+    # numbers as text mixed with the sentinels real reports use for missing scores
+    values = np.round(rng.uniform(low, high, n), 3).astype(str).astype(object)
+    missing = rng.random(n) < 0.2
+    values[missing] = rng.choice(sentinels, missing.sum())
+    return values
+
+
+def make_chunk(rng, n, report_type, n_genes=20000):
+    genes = np.array(["GENE%d" % gene for gene in range(n_genes)], dtype=object)
+    gene = genes[rng.integers(0, n_genes, n)]
+    chromosome = rng.choice(CHROMOSOMES, n, p=[0.95 / 22] * 22 + [0.04, 0.01])
+    chunk = {
+        "Position": chromosome.astype(object)
+        + ":"
+        + rng.integers(1, 250000000, n).astype(str).astype(object),
+        "Ref": rng.choice(["A", "C", "G", "T"], n),
+        "Alt": rng.choice(["A", "C", "G", "T"], n),
+        "Gene": gene,
+        "Variation": rng.choice(CONSEQUENCES, n),
+        "Refseq_change": "NM_000000:c." + rng.integers(1, 5000, n).astype(str).astype(object) + "A>G",
+        "Clinvar": rng.choice([".", "Pathogenic", "Likely_pathogenic", "Benign"], n, p=[0.9, 0.03, 0.02, 0.05]),
+        "omim_phenotype": rng.choice([".", "Some syndrome, 123456 (3)", None], n, p=[0.6, 0.3, 0.1]),
+        "omim_inheritance": rng.choice([".", "AD", "AR", "XLR"], n),
+        "Panels": rng.choice([None, "immunopanel"], n, p=[0.9, 0.1]),
+    }
+    for sample in sample_ids(report_type):
+        sample_id = variants.parse_id(FAMILY_ID, sample)
+        chunk[variants.get_zygosity(sample_id)] = rng.choice(ZYGOSITIES, n, p=[0.5, 0.2, 0.3])
+        chunk[variants.get_burden(sample_id)] = rng.integers(0, 5, n)
+    chunk.update(
+        {
+            "Gnomad_af_popmax": np.round(rng.exponential(0.005, n), 6),
+            "Gnomad_ac": rng.integers(0, 500, n),
+            "Gnomad_hom": rng.choice([0, 0, 0, 1, 3], n),
+            "Gnomad_oe_lof_score": np.where(rng.random(n) < 0.3, np.nan, np.round(rng.random(n), 3)),
+            "Cadd_score": scores(rng, n, 0, 40, ["None", "."]),
+            "Sift_score": scores(rng, n, 0, 1, ["None"]),
+            "Polyphen_score": scores(rng, n, 0, 1, ["None"]),
+            "Vest3_score": scores(rng, n, 0, 1, ["None", "."]),
+            "Revel_score": scores(rng, n, 0, 1, ["None", "."]),
+            "Exac_pli_score": scores(rng, n, 0, 1, ["."]),
+            "C4R_WES_counts": rng.integers(0, 150, n),
+            "Quality": np.round(rng.uniform(10, 3000, n), 2),
+        }
+    )
+    return pd.DataFrame(chunk)
+
+
+def make_report(path, n_rows, report_type, seed=0, chunksize=500000):
+    """
+    Writes a synthetic C4R-style report of n_rows variants to path (tab separated
+    if path ends in .tsv), generated chunksize rows at a time.
+    """
+    rng = np.random.default_rng(seed)
+    sep = "\t" if path.endswith(".tsv") else ","
+    written = 0
+    while written < n_rows:
+        n = min(chunksize, n_rows - written)
+        make_chunk(rng, n, report_type).to_csv(
+            path, sep=sep, index=False, header=written == 0, mode="w" if written == 0 else "a"
+        )
+        written += n
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a synthetic C4R-style variant report")
+    parser.add_argument("-output", type=str, help="output csv or tsv")
+    parser.add_argument("-rows", type=int, help="number of variants", default=1000)
+    parser.add_argument("-report_type", type=str, help="singleton or trio", default="singleton")
+    parser.add_argument("-seed", type=int, help="random seed", default=0)
+    args = parser.parse_args()
+
+    make_report(args.output, args.rows, args.report_type, args.seed)
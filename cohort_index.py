@@ -0,0 +1,63 @@
+import argparse
+import glob
+import os
+import time
+from group_variants import cohort
+import batch_reports
+
+
+def main(index, reports, manifest, gene):
+    connection = cohort.connect(index)
+    if gene:
+        start = time.perf_counter()
+        carriers = cohort.gene_carriers(connection, gene)
+        print(carriers.to_string(index=False))
+        print(
+            "%d carriers in %d families (%.1f ms)"
+            % (len(carriers), carriers["family_id"].nunique(), (time.perf_counter() - start) * 1000)
+        )
+        return
+
+    # family ids come from the manifest when there is one, otherwise from report names
+    if manifest:
+        families = {
+            os.path.abspath(family["report"]): family["family_id"]
+            for family in batch_reports.read_manifest(manifest)
+        }
+        paths = list(families)
+        family_id = families.get
+    else:
+        paths = sorted(
+            glob.glob(os.path.join(reports, "*.csv")) + glob.glob(os.path.join(reports, "*.tsv"))
+        )
+        family_id = cohort.family_from_path
+    indexed, skipped, removed = cohort.update_index(connection, paths, family_id)
+    print(
+        "%d reports indexed, %d unchanged, %d removed from %s"
+        % (indexed, skipped, removed, index)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Builds or updates a cohort index of the genes and variants each family carries, or queries it for a gene"
+    )
+    parser.add_argument("-index", type=str, help="sqlite index file, created if missing")
+    parser.add_argument(
+        "-reports",
+        type=str,
+        help="directory of csv/tsv reports to index; family ids are taken from the start of report names",
+        default=None,
+    )
+    parser.add_argument(
+        "-manifest",
+        type=str,
+        help="batch_reports.py manifest listing the reports to index with their family ids, instead of -reports",
+        default=None,
+    )
+    parser.add_argument(
+        "-gene", type=str, help="print the carriers of a gene instead of updating", default=None
+    )
+    args = parser.parse_args()
+
+    main(args.index, args.reports, args.manifest, args.gene)
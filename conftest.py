@@ -0,0 +1 @@
+# keeps the repository root importable from tests/, like the scripts run from it
@@ -1,9 +1,10 @@
+import numpy as np
 import pandas as pd
 import argparse
-from group_variants import variants
+from group_variants import variants, reader, cache, writer, timing, views
 
 
-def main(report, file):
+def main(report, file, timer=None):
     """
     From a C4R variant csv, creates an excel document with the following tabs:
     - One tab containing ALL variants
@@ -11,86 +12,119 @@ def main(report, file):
     - One tab with above filters containing variants only in OMIM genes (also includes ClinVar pathogenic variants >1% AF)
     """
 
-    # add summary for each variant describing pathogenicity predictions and gnomad frequency
-    summaries = []
-    for index, variant in report.iterrows():
-        try:
-            summary = variants.summary_field(
-                variant["Cadd_score"],
-                variant["Sift_score"],
-                variant["Polyphen_score"],
-                variant["Vest3_score"],
-                variant["Revel_score"],
-                variant["Gnomad_ac"],
-                variant["Gnomad_hom"],
-                variant["Refseq_change"],
-                variant["Variation"],
-                variant["Gene"],
-                variant["C4R_WES_counts"],
-                variant["Quality"],
-                variant["Exac_pli_score"],
-            )
-        except KeyError:
-            summary = variants.summary_field(
-                variant["Cadd_score"],
-                variant["Sift_score"],
-                variant["Polyphen_score"],
-                variant["Vest3_score"],
-                variant["Revel_score"],
-                variant["Gnomad_ac"],
-                variant["Gnomad_hom"],
-                variant["Refseq_change"],
-                variant["Variation"],
-                variant["Gene"],
-                variant["Frequency_in_C4R"],
-                variant["Quality"],
-                variant["Exac_pli_score"],
-            )
-        summaries.append(summary)
-    report["Summary"] = summaries
-    cols = list(report.columns)
-    cols = [cols[-1]] + cols[:-1]
-    report = report[cols]
+    if timer is None:
+        timer = timing.StageTimer()
 
-    # first get clinvar path > 1% so can add to OMIM tab
-    clinvar_greater_than_1 = report[report["Gnomad_af_popmax"] > 0.01]
+    # report is either a DataFrame or an iterator of DataFrame chunks
+    if isinstance(report, pd.DataFrame):
+        report = [report]
 
-    # apply gnomAD, C4R counts, quality
-    try:
-        report_filter = report[report["Frequency_in_C4R"] < 10]
-    except KeyError:
-        report_filter = report[report["C4R_WES_counts"] < 10]
+    # the rows of each chunk kept for the filtered tabs, copied once, and the
+    # positions of the clinvar and filtered variants in them
+    kept_chunks = []
+    clinvar_rows_kept = []
+    filter_rows_kept = []
+    kept = 0
+    with writer.open_workbook("%s_for_exome_rounds.xlsx" % file) as workbook:
+        all_sheet = None
+        for chunk in report:
+            # filters only read raw columns, so they run first and keep row positions
+            with timer.stage("filter", len(chunk)) as stage:
+                # first get clinvar path > 1% so can add to OMIM tab
+                clinvar_rows = np.flatnonzero(chunk["Gnomad_af_popmax"] > 0.01)
 
-    report_filter = report_filter[
-        (report_filter["Gnomad_hom"] == 0) & (report_filter["Quality"] >= 300)
-    ]
+                # apply gnomAD, C4R counts, quality
+                try:
+                    rare = chunk["Frequency_in_C4R"] < 10
+                except KeyError:
+                    rare = chunk["C4R_WES_counts"] < 10
+                # a missing count passes no filter
+                filter_rows = np.flatnonzero(
+                    (rare & (chunk["Gnomad_hom"] == 0) & (chunk["Quality"] >= 300)).to_numpy(
+                        dtype=bool, na_value=False
+                    )
+                )
+                stage.rows_out = (stage.rows_out or 0) + len(filter_rows)
 
-    # get variants in OMIM genes
-    omim = report_filter[
-        (report_filter["omim_phenotype"] != ".")
-        & (
-            (report_filter["omim_phenotype"] == report_filter["omim_phenotype"])
-            | (report_filter["omim_phenotype"].notnull())
-        )
-    ]
+            # add summary for each variant describing pathogenicity predictions and gnomad frequency
+            # (reports read through the cache already have one). Every variant is
+            # written to the all tab, so this is done once per chunk just before writing
+            with timer.stage("summary", len(chunk)) as stage:
+                if "Summary" not in chunk.columns:
+                    chunk["Summary"] = variants.summary_fields(chunk)
+                    cols = list(chunk.columns)
+                    cols = [cols[-1]] + cols[:-1]
+                    chunk = chunk[cols]
+                rows = np.union1d(clinvar_rows, filter_rows)
+                kept_chunks.append(chunk.iloc[rows])
+                clinvar_rows_kept.append(kept + np.searchsorted(rows, clinvar_rows))
+                filter_rows_kept.append(kept + np.searchsorted(rows, filter_rows))
+                kept += len(rows)
+                stage.rows_out = (stage.rows_out or 0) + len(chunk)
 
-    omim_clinvar = pd.concat([omim, clinvar_greater_than_1], ignore_index=True)
+            # only the kept variants stay in memory; all variants are written as they are read
+            with timer.stage("write_all", len(chunk)):
+                if all_sheet is None:
+                    all_sheet = writer.SheetWriter(workbook, "all", chunk.columns)
+                all_sheet.append(chunk)
 
-    # write report
-    with pd.ExcelWriter("%s_for_exome_rounds.xlsx" % file) as writer:
-        workbook = writer.book
-        report.to_excel(writer, sheet_name="all", index=False)
-        report_filter.to_excel(writer, sheet_name="rare_high_qual", index=False)
-        omim_clinvar.to_excel(writer, sheet_name="rare_high_qual_omim", index=False)
+        with timer.stage("omim") as stage:
+            # both tabs are views of the kept rows
+            report_kept = pd.concat(kept_chunks)
+            clinvar_rows = np.concatenate(clinvar_rows_kept)
+            filter_rows = np.concatenate(filter_rows_kept)
+            stage.rows_in = len(filter_rows) + len(clinvar_rows)
 
+            # get variants in OMIM genes
+            omim_phenotype = report_kept["omim_phenotype"].iloc[filter_rows]
+            omim = (omim_phenotype != ".") & (
+                (omim_phenotype == omim_phenotype) | (omim_phenotype.notnull())
+            )
+            omim_rows = filter_rows[omim.to_numpy(dtype=bool, na_value=False)]
+
+            report_filter = views.RowView(report_kept, filter_rows)
+            omim_clinvar = views.RowView(
+                report_kept, np.concatenate([omim_rows, clinvar_rows])
+            )
+            stage.rows_out = len(omim_clinvar)
+
+        with timer.stage("write_filtered", len(report_filter) + len(omim_clinvar)):
+            writer.write_frame(workbook, "rare_high_qual", report_filter)
+            writer.write_frame(workbook, "rare_high_qual_omim", omim_clinvar)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Filter variants for streamlined SickKids WES analysis"
     )
     parser.add_argument("-report", type=str, help="input report tsv")
+    parser.add_argument(
+        "-chunksize",
+        type=int,
+        help="number of variants to process at a time",
+        default=100000,
+    )
+    parser.add_argument(
+        "-cache_dir",
+        type=str,
+        help="directory to cache parsed reports in, shared by all scripts",
+        default=None,
+    )
+    parser.add_argument(
+        "-timings",
+        action="store_true",
+        help="write per-stage time, memory and row counts to a .timings.json file next to the output",
+    )
     args = parser.parse_args()
 
+    timer = timing.StageTimer(args.timings)
     file = args.report.replace(".tsv", "")
-    report = pd.read_csv(args.report, encoding="ISO-8859-1", sep="\t")
-    main(report, file)
+    if args.cache_dir:
+        with timer.stage("read") as stage:
+            report = cache.read_report(args.report, args.cache_dir, summary=True)
+            stage.rows_out = len(report)
+    else:
+        report = timer.iterate(
+            "read", reader.read_report(args.report, chunksize=args.chunksize)
+        )
+    main(report, file, timer)
+    timer.write("%s_for_exome_rounds.timings.json" % file)
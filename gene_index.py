@@ -0,0 +1,74 @@
+import argparse
+import glob
+import os
+import time
+from group_variants import genes
+
+
+def panel_paths(panels):
+    # panel files, or directories of them
+    paths = []
+    for panel in panels:
+        if os.path.isdir(panel):
+            paths += sorted(
+                path
+                for path in glob.glob(os.path.join(panel, "*"))
+                if os.path.isfile(path) and not os.path.basename(path).startswith(".")
+            )
+        else:
+            paths.append(panel)
+    return paths
+
+
+def main(index, panels, genemap, gene):
+    if gene:
+        start = time.perf_counter()
+        gene_index = genes.load_index(index)
+        load_ms = (time.perf_counter() - start) * 1000
+        row = genes.lookup(gene_index, [gene])[0]
+        if row < 0:
+            print("%s is not in %s" % (gene, index))
+            return
+        print("gene: %s" % gene_index["genes"][row])
+        print("omim_phenotype: %s" % gene_index["phenotypes"][row])
+        print("omim_inheritance: %s" % gene_index["inheritance"][row])
+        print("panels: %s" % ",".join(genes.gene_panels(gene_index, row)))
+        print("(index loaded in %.1f ms)" % load_ms)
+        return
+
+    start = time.perf_counter()
+    gene_index = genes.compile_index(panel_paths(panels), genemap)
+    genes.save_index(gene_index, index)
+    print(
+        "%d genes, %d ids, %d panels compiled to %s in %.1fs"
+        % (
+            len(gene_index["genes"]),
+            len(gene_index["keys"]),
+            len(gene_index["panels"]),
+            index,
+            time.perf_counter() - start,
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compiles gene panels and an OMIM genemap into an index used to annotate reports, or looks up a gene in it"
+    )
+    parser.add_argument("-index", type=str, help="compiled index file to write or read")
+    parser.add_argument(
+        "-panels",
+        type=str,
+        nargs="*",
+        help="gene panel files, one gene per line and named after the file, or directories of them",
+        default=[],
+    )
+    parser.add_argument(
+        "-genemap", type=str, help="OMIM genemap2.txt", default=None
+    )
+    parser.add_argument(
+        "-gene", type=str, help="print the index entry of a gene instead of compiling", default=None
+    )
+    args = parser.parse_args()
+
+    main(args.index, args.panels, args.genemap, args.gene)
@@ -0,0 +1,74 @@
+import hashlib
+import os
+import pandas as pd
+from group_variants import reader, variants
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# column the cache stores a computed Summary under, so reports that did not have
+# a Summary column can be returned without one
+CACHED_SUMMARY = "_summary"
+
+
+# bumped whenever the cached frame's layout changes, e.g. normalized scores
+CACHE_VERSION = 4
+
+
+def cache_path(path, cache_dir):
+    # reports are keyed by absolute path, size and modification time, so an
+    # edited or replaced report is parsed again
+    stat = os.stat(path)
+    key = "%s:%d:%d:%d" % (
+        os.path.abspath(path),
+        stat.st_size,
+        stat.st_mtime_ns,
+        CACHE_VERSION,
+    )
+    return os.path.join(cache_dir, "%s.parquet" % hashlib.sha1(key.encode()).hexdigest())
+
+
+def write_cache(report, cached):
+    # write to a temporary file first so concurrent runs never see a partial cache
+    os.makedirs(os.path.dirname(cached) or ".", exist_ok=True)
+    report.to_parquet(cached + ".%d.tmp" % os.getpid(), index=False)
+    os.replace(cached + ".%d.tmp" % os.getpid(), cached)
+
+
+def read_report(path, cache_dir=None, summary=False):
+    """
+    Reads a variant report, reusing the parsed frame stored in cache_dir by an
+    earlier run on the same file. Without cache_dir, or without pyarrow
+    installed, the report is parsed from text every time.
+    Summaries are only computed when asked for: with summary=True, the Summary
+    column of every variant is the first column of the returned frame, and is
+    cached. With summary=False, a Summary is attached only when the cache
+    already holds one, and with summary=None never.
+    """
+    if cache_dir is None or pyarrow is None:
+        if cache_dir is not None:
+            print("pyarrow is not installed, not caching %s" % path)
+        report = reader.read_report(path)
+        if summary and "Summary" not in report.columns:
+            report.insert(0, "Summary", variants.summary_fields(report))
+        return report
+
+    cached = cache_path(path, cache_dir)
+    if os.path.exists(cached):
+        report = pd.read_parquet(cached)
+        if summary and "Summary" not in report.columns and CACHED_SUMMARY not in report.columns:
+            report[CACHED_SUMMARY] = variants.summary_fields(report)
+            write_cache(report, cached)
+    else:
+        report = reader.read_report(path)
+        if summary and "Summary" not in report.columns:
+            report[CACHED_SUMMARY] = variants.summary_fields(report)
+        write_cache(report, cached)
+
+    if CACHED_SUMMARY in report.columns:
+        report_summary = report.pop(CACHED_SUMMARY)
+        if summary is not None:
+            report.insert(0, "Summary", report_summary)
+    return report
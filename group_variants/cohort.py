@@ -0,0 +1,206 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from group_variants import reader, variants
+
+# one row per sample carrying a qualifying variant, plus the reports indexed so
+# far so an update only reads new or changed reports
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    path TEXT PRIMARY KEY,
+    family_id TEXT,
+    size INTEGER,
+    mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS carriers (
+    gene TEXT,
+    family_id TEXT,
+    sample TEXT,
+    position TEXT,
+    ref TEXT,
+    alt TEXT,
+    zygosity TEXT,
+    report TEXT
+);
+-- family_id in both indexes so recurrence counts never read the table
+CREATE INDEX IF NOT EXISTS carriers_gene ON carriers (gene, family_id);
+CREATE INDEX IF NOT EXISTS carriers_variant ON carriers (position, ref, alt, family_id);
+CREATE INDEX IF NOT EXISTS carriers_report ON carriers (report);
+"""
+
+# cohort columns added to reports by recurrence()
+GENE_FAMILIES = "Cohort_gene_families"
+VARIANT_FAMILIES = "Cohort_variant_families"
+
+
+def connect(path):
+    connection = sqlite3.connect(path)
+    # readers can query the index while it is being updated
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def family_from_path(path):
+    # C4R report names start with the family id, e.g. 1234.wes.regular.csv
+    return os.path.basename(path).split(".")[0]
+
+
+def qualifying(report):
+    """
+    Variants counted in the index: an impactful consequence or a ClinVar
+    pathogenic assertion, and no gnomAD homozygotes.
+    """
+    return variants.impact_mask(report["Variation"], report["Clinvar"]) & (
+        report["Gnomad_hom"] == 0
+    ).to_numpy(dtype=bool, na_value=False)
+
+
+def report_carriers(report, family_id):
+    # one row per (qualifying variant, sample carrying it), from every Zygosity.* column
+    report = report.iloc[np.flatnonzero(qualifying(report))]
+    carriers = []
+    for column in [c for c in report.columns if c.startswith("Zygosity.")]:
+        zygosity = report[column].astype(object)
+        carried = zygosity.isin(["Het", "Hom"]).to_numpy()
+        carriers.append(
+            pd.DataFrame(
+                {
+                    "gene": report["Gene"].astype(object).to_numpy()[carried],
+                    "family_id": family_id,
+                    "sample": column[len("Zygosity.") :],
+                    "position": report["Position"].to_numpy()[carried],
+                    "ref": report["Ref"].to_numpy()[carried],
+                    "alt": report["Alt"].to_numpy()[carried],
+                    "zygosity": zygosity.to_numpy()[carried],
+                }
+            )
+        )
+    if not carriers:
+        return pd.DataFrame(
+            columns=["gene", "family_id", "sample", "position", "ref", "alt", "zygosity"]
+        )
+    return pd.concat(carriers, ignore_index=True)
+
+
+def index_report(connection, path, family_id, chunksize=100000):
+    """
+    Replaces the carriers of one report in the index. Returns the number of
+    carrier rows added.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    added = 0
+    with connection:
+        connection.execute("DELETE FROM carriers WHERE report = ?", (path,))
+        for chunk in reader.read_report(path, chunksize=chunksize):
+            carriers = report_carriers(chunk, family_id)
+            carriers["report"] = path
+            connection.executemany(
+                "INSERT INTO carriers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                carriers.itertuples(index=False, name=None),
+            )
+            added += len(carriers)
+        connection.execute(
+            "INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?)",
+            (path, family_id, stat.st_size, stat.st_mtime_ns),
+        )
+    return added
+
+
+def update_index(connection, paths, family_id=family_from_path):
+    """
+    Brings the index up to date with a set of reports: new or modified reports
+    are (re)indexed, unchanged ones skipped, and reports no longer listed removed.
+    family_id maps a report path to its family. Returns (indexed, skipped, removed).
+    """
+    paths = [os.path.abspath(path) for path in paths]
+    indexed = {
+        path: (size, mtime_ns)
+        for path, size, mtime_ns in connection.execute(
+            "SELECT path, size, mtime_ns FROM reports"
+        )
+    }
+    counts = [0, 0, 0]
+    for path in paths:
+        stat = os.stat(path)
+        if indexed.get(path) == (stat.st_size, stat.st_mtime_ns):
+            counts[1] += 1
+            continue
+        added = index_report(connection, path, family_id(path))
+        print("%s: %d carriers" % (path, added), flush=True)
+        counts[0] += 1
+    with connection:
+        for path in set(indexed) - set(paths):
+            connection.execute("DELETE FROM carriers WHERE report = ?", (path,))
+            connection.execute("DELETE FROM reports WHERE path = ?", (path,))
+            counts[2] += 1
+    return tuple(counts)
+
+
+def gene_carriers(connection, gene):
+    return pd.read_sql_query(
+        "SELECT family_id, sample, position, ref, alt, zygosity FROM carriers "
+        "WHERE gene = ? ORDER BY family_id, sample, position",
+        connection,
+        params=(gene,),
+    )
+
+
+def recurrence(connection, report, family_id=None):
+    """
+    Returns the report with two cohort columns: the number of other families
+    with a qualifying variant in the same gene, and with the same variant.
+    """
+    connection.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS query (gene TEXT, position TEXT, ref TEXT, alt TEXT)"
+    )
+    with connection:
+        connection.execute("DELETE FROM query")
+        connection.executemany(
+            "INSERT INTO query VALUES (?, ?, ?, ?)",
+            zip(
+                report["Gene"].astype(object),
+                report["Position"].astype(object),
+                report["Ref"].astype(object),
+                report["Alt"].astype(object),
+            ),
+        )
+    genes = pd.read_sql_query(
+        "SELECT gene, COUNT(DISTINCT family_id) AS families FROM carriers "
+        "WHERE gene IN (SELECT DISTINCT gene FROM query) AND family_id IS NOT ? "
+        "GROUP BY gene",
+        connection,
+        params=(family_id,),
+    )
+    # CROSS JOIN keeps the query sites as the outer loop, looking each one up in
+    # carriers_variant instead of scanning the whole cohort
+    sites = pd.read_sql_query(
+        "SELECT q.position, q.ref, q.alt, COUNT(DISTINCT c.family_id) AS families "
+        "FROM (SELECT DISTINCT position, ref, alt FROM query) q CROSS JOIN carriers c "
+        "ON c.position = q.position AND c.ref = q.ref AND c.alt = q.alt "
+        "WHERE c.family_id IS NOT ? GROUP BY q.position, q.ref, q.alt",
+        connection,
+        params=(family_id,),
+    )
+    gene_families = report["Gene"].astype(object).map(
+        genes.set_index("gene")["families"]
+    )
+    site_families = (
+        report[["Position", "Ref", "Alt"]]
+        .astype(object)
+        .merge(
+            sites,
+            how="left",
+            left_on=["Position", "Ref", "Alt"],
+            right_on=["position", "ref", "alt"],
+        )["families"]
+    )
+    return report.assign(
+        **{
+            GENE_FAMILIES: gene_families.fillna(0).to_numpy(dtype=np.int32),
+            VARIANT_FAMILIES: site_families.fillna(0).to_numpy(dtype=np.int32),
+        }
+    )
@@ -0,0 +1,246 @@
+import os
+import pickle
+import re
+import numpy as np
+import pandas as pd
+from group_variants import vcf
+
+# bumped whenever the layout of a compiled index changes
+INDEX_VERSION = 1
+
+# OMIM inheritance modes as they are abbreviated in omim_inheritance
+INHERITANCE = {
+    "Autosomal dominant": "AD",
+    "Autosomal recessive": "AR",
+    "X-linked": "XL",
+    "X-linked dominant": "XLD",
+    "X-linked recessive": "XLR",
+    "Y-linked": "YL",
+    "Pseudoautosomal dominant": "PD",
+    "Pseudoautosomal recessive": "PR",
+    "Digenic dominant": "DD",
+    "Digenic recessive": "DR",
+    "Mitochondrial": "Mi",
+    "Multifactorial": "Mu",
+    "Isolated cases": "IC",
+    "Somatic mutation": "SMu",
+    "Somatic mosaicism": "SMo",
+    "Inherited chromosomal imbalance": "ICB",
+}
+
+# genemap2.txt columns holding the gene symbol, and other ids genes can be looked up by
+GENEMAP_SYMBOL = "Approved Gene Symbol"
+GENEMAP_IDS = ["MIM Number", "Entrez Gene ID", "Ensembl Gene ID"]
+GENEMAP_ALIASES = ["Gene Symbols", "Gene/Locus And Other Related Symbols"]
+
+# a phenotype ends with its mapping key, e.g. "(3)", then its inheritance modes
+PHENOTYPE = re.compile(r"^(.*\(\d\))(?:, (.*))?$")
+
+
+def read_panel(path):
+    """
+    Reads a gene panel: one gene per line, as the first tab, comma or space
+    separated field, with # comments and an optional gene/symbol header. The
+    panel is named after the file.
+    """
+    genes = []
+    with vcf.open_text(path) as f:
+        for line in f:
+            fields = re.split(r"[\t, ]+", line.strip())
+            if not fields[0] or line.startswith("#"):
+                continue
+            if not genes and fields[0].lower() in vcf.GENE_NAMES:
+                continue
+            genes.append(fields[0])
+    name = os.path.basename(path)
+    for extension in [".gz", ".txt", ".tsv", ".csv"]:
+        if name.endswith(extension):
+            name = name[: -len(extension)]
+    return name, list(dict.fromkeys(genes))
+
+
+def read_genemap(path):
+    """
+    Reads an OMIM genemap2.txt. The header is the last # line before the data.
+    Rows without an approved gene symbol are dropped.
+    """
+    header = None
+    with vcf.open_text(path) as f:
+        for line in f:
+            if not line.startswith("#"):
+                break
+            if GENEMAP_SYMBOL in line:
+                header = line.lstrip("# ").rstrip("\n").split("\t")
+    if header is None:
+        raise ValueError("%s has no '%s' column, is it genemap2.txt?" % (path, GENEMAP_SYMBOL))
+    genemap = pd.read_csv(
+        path, sep="\t", comment="#", names=header, dtype=str, keep_default_na=False
+    )
+    return genemap[genemap[GENEMAP_SYMBOL] != ""].drop_duplicates(GENEMAP_SYMBOL)
+
+
+def parse_phenotypes(phenotypes):
+    """
+    Splits a genemap2 Phenotypes value into (phenotypes, inheritance): the
+    phenotypes without their inheritance modes, and the distinct abbreviated
+    modes, each joined like the omim_phenotype and omim_inheritance columns.
+    """
+    names = []
+    modes = []
+    for phenotype in filter(None, (p.strip() for p in phenotypes.split(";"))):
+        match = PHENOTYPE.match(phenotype)
+        if match is None:
+            names.append(phenotype)
+            continue
+        names.append(match.group(1))
+        for mode in filter(None, (match.group(2) or "").split(", ")):
+            mode = INHERITANCE.get(mode.lstrip("?"), mode)
+            if mode not in modes:
+                modes.append(mode)
+    return "; ".join(names) or ".", ",".join(modes) or "."
+
+
+def source_stamps(paths):
+    # a compiled index is out of date once any of its sources is modified
+    return {
+        os.path.abspath(path): (os.stat(path).st_size, os.stat(path).st_mtime_ns)
+        for path in paths
+    }
+
+
+def compile_index(panel_paths, genemap_path=None):
+    """
+    Compiles gene panels and an OMIM genemap into arrays indexed by gene: OMIM
+    phenotypes and inheritance modes, and a bit matrix of panel membership.
+    Genes are looked up by symbol, OMIM/Entrez/Ensembl id or, failing those,
+    alias; panels listing a gene under any of these share its row.
+    """
+    symbols = []
+    phenotypes = []
+    inheritance = []
+    keys = {}
+    if genemap_path:
+        genemap = read_genemap(genemap_path)
+        symbols = genemap[GENEMAP_SYMBOL].tolist()
+        parsed = [parse_phenotypes(p) for p in genemap.get("Phenotypes", [""] * len(genemap))]
+        phenotypes = [p for p, _ in parsed]
+        inheritance = [i for _, i in parsed]
+        # symbols first so an alias never hides another gene's symbol
+        for column in [GENEMAP_SYMBOL] + GENEMAP_IDS + GENEMAP_ALIASES:
+            if column not in genemap.columns:
+                continue
+            for row, values in enumerate(genemap[column]):
+                for key in filter(None, (v.strip() for v in values.split(","))):
+                    keys.setdefault(key, row)
+
+    panels = [read_panel(path) for path in panel_paths]
+    members = []
+    for _, genes in panels:
+        rows = []
+        for gene in genes:
+            if gene not in keys:
+                keys[gene] = len(symbols)
+                symbols.append(gene)
+                phenotypes.append(".")
+                inheritance.append(".")
+            rows.append(keys[gene])
+        members.append(rows)
+
+    membership = np.zeros((len(symbols), len(panels)), dtype=bool)
+    for panel, rows in enumerate(members):
+        membership[rows, panel] = True
+    return {
+        "version": INDEX_VERSION,
+        "sources": source_stamps(list(panel_paths) + ([genemap_path] if genemap_path else [])),
+        "genes": np.array(symbols, dtype=object),
+        "keys": np.array(list(keys), dtype=object),
+        "key_rows": np.array(list(keys.values()), dtype=np.int32),
+        "phenotypes": np.array(phenotypes, dtype=object),
+        "inheritance": np.array(inheritance, dtype=object),
+        "panels": np.array([name for name, _ in panels], dtype=object),
+        # one bit per panel, so hundreds of panels take a few bytes per gene
+        "membership": np.packbits(membership, axis=1),
+    }
+
+
+def save_index(index, path):
+    # temporary file first so a reader never sees a partial index
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+
+
+def is_current(index):
+    return index["version"] == INDEX_VERSION and all(
+        os.path.exists(path) and source_stamps([path])[path] == tuple(stamp)
+        for path, stamp in index["sources"].items()
+    )
+
+
+def load_index(path, panels=None):
+    """
+    Loads a compiled index, keeping only the named panels if given. Warns when
+    a source was modified since the index was compiled.
+    """
+    with open(path, "rb") as f:
+        index = pickle.load(f)
+    if index["version"] != INDEX_VERSION:
+        raise ValueError("%s was compiled by another version, compile it again" % path)
+    if not is_current(index):
+        print("%s: gene panels or OMIM changed since the index was compiled" % path)
+    if panels is not None:
+        missing = [panel for panel in panels if panel not in set(index["panels"])]
+        if missing:
+            raise ValueError("%s has no panels %s" % (path, ", ".join(missing)))
+        selected = pd.Index(index["panels"]).get_indexer(panels)
+        membership = np.unpackbits(
+            index["membership"], axis=1, count=len(index["panels"])
+        )[:, selected]
+        index = dict(
+            index,
+            panels=index["panels"][selected],
+            membership=np.packbits(membership, axis=1),
+        )
+    return index
+
+
+def lookup(index, genes):
+    # index rows of genes, -1 for genes not in the index
+    rows = pd.Index(index["keys"]).get_indexer(genes)
+    return np.where(rows >= 0, index["key_rows"][rows], -1)
+
+
+def gene_panels(index, row):
+    member = np.unpackbits(index["membership"][row], count=len(index["panels"]))
+    return list(index["panels"][member.astype(bool)])
+
+
+def annotate(report, index):
+    """
+    Returns the report with omim_phenotype, omim_inheritance and Panels taken
+    from a compiled index, joined on Gene. Each distinct gene is looked up once.
+    Genes not in the index get "." for OMIM and no panels.
+    """
+    codes, genes = pd.factorize(report["Gene"])
+    rows = lookup(index, np.asarray(genes, dtype=object))
+    found = rows >= 0
+
+    phenotypes = np.full(len(genes) + 1, ".", dtype=object)
+    inheritance = np.full(len(genes) + 1, ".", dtype=object)
+    phenotypes[:-1][found] = index["phenotypes"][rows[found]]
+    inheritance[:-1][found] = index["inheritance"][rows[found]]
+
+    panels = np.full(len(genes) + 1, np.nan, dtype=object)
+    membership = np.unpackbits(
+        index["membership"][rows[found]], axis=1, count=len(index["panels"])
+    ).astype(bool)
+    for gene, member in zip(np.flatnonzero(found), membership):
+        if member.any():
+            panels[gene] = ",".join(index["panels"][member])
+
+    # missing genes (code -1) take the last, empty entry
+    return report.assign(
+        omim_phenotype=phenotypes[codes],
+        omim_inheritance=pd.Categorical(inheritance[codes]),
+        Panels=panels[codes],
+    )
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from group_variants import views
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# columns identifying a variant across runs on the same family
+KEY_COLUMNS = ["Position", "Ref", "Alt"]
+
+
+def row_keys(report):
+    return pd.util.hash_pandas_object(report[KEY_COLUMNS], index=False).to_numpy()
+
+
+def row_hashes(report):
+    # content of every column a variant's summary, category and written row depend on
+    columns = [column for column in report.columns if column != "Summary"]
+    return pd.util.hash_pandas_object(report[columns], index=False).to_numpy()
+
+
+def frame_hashes(frame):
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def tab_hash(tab, hashes=None):
+    # changes with any value, the column names or the order of rows. The rows of a
+    # views.RowView are looked up in hashes, the frame_hashes of its frame, if given
+    if isinstance(tab, views.RowView):
+        if hashes is None:
+            hashes = frame_hashes(tab.frame)
+        rows = hashes[tab.rows]
+    else:
+        rows = frame_hashes(tab)
+    digest = hashlib.sha1(rows.tobytes())
+    digest.update("\t".join(str(column) for column in tab.columns).encode())
+    return digest.hexdigest()
+
+
+def state_paths(file):
+    return "%s_formatted.state.parquet" % file, "%s_formatted.state.json" % file
+
+
+def load_state(file, options):
+    """
+    Returns the rows and tab hashes stored by the previous incremental run on
+    this output, or (None, {}) if there was none or it used other options.
+    """
+    rows_path, tabs_path = state_paths(file)
+    if pyarrow is None or not (os.path.exists(rows_path) and os.path.exists(tabs_path)):
+        return None, {}
+    with open(tabs_path) as f:
+        state = json.load(f)
+    if state["options"] != options:
+        return None, {}
+    return pd.read_parquet(rows_path), state["tabs"]
+
+
+def save_state(file, options, rows, tabs):
+    if pyarrow is None:
+        print("pyarrow is not installed, not saving state for incremental runs")
+        return
+    rows_path, tabs_path = state_paths(file)
+    # temporary files first, so an interrupted run leaves the previous state intact
+    rows.to_parquet(rows_path + ".tmp", index=False)
+    with open(tabs_path + ".tmp", "w") as f:
+        json.dump({"options": options, "tabs": tabs}, f, indent=2)
+    os.replace(rows_path + ".tmp", rows_path)
+    os.replace(tabs_path + ".tmp", tabs_path)
+
+
+def match_rows(previous, keys, hashes):
+    """
+    Returns the position in the previous state of each current row, or -1 for
+    rows that are new or whose content changed, and the previous positions that
+    were not reused. Without a usable previous state every row is changed.
+    """
+    if (
+        previous is None
+        or not previous["key"].is_unique
+        or len(np.unique(keys)) != len(keys)
+    ):
+        return np.full(len(keys), -1), np.arange(0)
+    positions = pd.Index(previous["key"]).get_indexer(keys)
+    found = positions >= 0
+    unchanged = np.zeros(len(keys), dtype=bool)
+    unchanged[found] = previous["content"].to_numpy()[positions[found]] == hashes[found]
+    positions = np.where(unchanged, positions, -1)
+    stale = np.setdiff1d(np.arange(len(previous)), positions[unchanged])
+    return positions, stale
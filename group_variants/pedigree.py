@@ -0,0 +1,236 @@
+import numpy as np
+import pandas as pd
+from group_variants import variants
+
+# segregation categories, sharing bits with variants.classify where the meaning
+# matches; SHARED_BY_AFFECTED needs a wider mask than classify's uint8
+AUTOSOMAL_RECESSIVE = variants.AUTOSOMAL_RECESSIVE
+COMPOUND_HET = variants.COMPOUND_HET
+X_LINKED = variants.HEMIZYGOUS
+DE_NOVO = variants.DE_NOVO
+SHARED_BY_AFFECTED = 256
+
+# genotype codes in the matrix; samples missing from a report are UNKNOWN
+UNKNOWN = -1
+ABSENT, HET, HOM = variants.ABSENT, variants.HET, variants.HOM
+
+# PED sex and phenotype codes
+MALE, FEMALE = "1", "2"
+AFFECTED = "2"
+
+
+class Pedigree:
+    """
+    One family from a PED file. Samples keep the file's order, which is the
+    column order of the genotype matrix.
+    """
+
+    def __init__(self, family_id):
+        self.family_id = family_id
+        self.samples = []
+        self.father = {}
+        self.mother = {}
+        self.sex = {}
+        self.affected = set()
+
+    def add(self, sample, father, mother, sex, phenotype):
+        self.samples.append(sample)
+        self.father[sample] = father if father not in ["0", "."] else None
+        self.mother[sample] = mother if mother not in ["0", "."] else None
+        self.sex[sample] = sex
+        if phenotype == AFFECTED:
+            self.affected.add(sample)
+
+    def column_id(self, sample):
+        # sample id as used in the report's Zygosity.* and Burden.* columns
+        return variants.parse_id(self.family_id, sample)
+
+    def index(self, samples):
+        return np.array([self.samples.index(sample) for sample in samples], dtype=int)
+
+    def affected_samples(self):
+        return [sample for sample in self.samples if sample in self.affected]
+
+    def unaffected_samples(self):
+        return [sample for sample in self.samples if sample not in self.affected]
+
+    def trios(self, samples):
+        # samples with both parents in the pedigree, as (child, mother, father)
+        return [
+            (sample, self.mother[sample], self.father[sample])
+            for sample in samples
+            if self.mother[sample] in self.samples and self.father[sample] in self.samples
+        ]
+
+
+def read_ped(path, family_id=None):
+    """
+    Reads a PED file (family, individual, father, mother, sex, phenotype; tab or
+    whitespace separated, # comments allowed). Returns the pedigree of family_id,
+    or of the only family in the file.
+    """
+    pedigrees = {}
+    with open(path) as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            family, sample, father, mother, sex, phenotype = line.split()[:6]
+            pedigrees.setdefault(family, Pedigree(family)).add(
+                sample, father, mother, sex, phenotype
+            )
+    if family_id is None:
+        if len(pedigrees) != 1:
+            raise ValueError("%s has %d families, pass family_id" % (path, len(pedigrees)))
+        family_id = list(pedigrees)[0]
+    return pedigrees[family_id]
+
+
+def genotype_matrix(variants_df, pedigree):
+    """
+    Encodes the Zygosity.* column of every pedigree sample into an int8 matrix of
+    variants x samples (-1 unknown or missing sample, 0 absent, 1 het, 2 hom).
+    """
+    matrix = np.full((len(variants_df), len(pedigree.samples)), UNKNOWN, dtype=np.int8)
+    for i, sample in enumerate(pedigree.samples):
+        column = variants.get_zygosity(pedigree.column_id(sample))
+        if column in variants_df.columns:
+            matrix[:, i] = variants.encode_zygosity(variants_df[column])
+    return matrix
+
+
+def _all(matrix, columns, condition):
+    # condition holds for every listed sample; true when there are none
+    return condition(matrix[:, columns]).all(axis=1)
+
+
+def _any(matrix, columns, condition):
+    return condition(matrix[:, columns]).any(axis=1)
+
+
+def _gene_has(gene_codes, mask, n_genes):
+    # per variant: does any variant of the same gene satisfy mask
+    known = gene_codes >= 0
+    has = np.bincount(gene_codes[mask & known], minlength=n_genes) > 0
+    return known & has[np.maximum(gene_codes, 0)]
+
+
+def segregate(variants_df, pedigree, matrix=None):
+    """
+    Evaluates segregation rules over the genotype matrix and returns a bitmask
+    Series aligned to the variants index:
+    - AUTOSOMAL_RECESSIVE: off X, every affected hom, no unaffected hom, and
+      genotyped parents of affected samples het
+    - X_LINKED: on X, every affected hom, no unaffected male carrier and no
+      unaffected female hom
+    - DE_NOVO: every affected carries it, and it is absent from both parents of
+      each affected sample with genotyped parents and from every unaffected sample
+    - COMPOUND_HET: every affected is het, and for each affected sample with
+      genotyped parents the variant comes from one parent or is de novo, in a
+      gene with a het variant from each parent or a de novo het variant; with
+      no genotyped parents, genes with two or more such variants
+    - SHARED_BY_AFFECTED: every affected carries it and no unaffected sample does
+    """
+    if matrix is None:
+        matrix = genotype_matrix(variants_df, pedigree)
+    categories = np.zeros(len(variants_df), dtype=np.uint16)
+    affected = pedigree.index(pedigree.affected_samples())
+    unaffected = pedigree.index(pedigree.unaffected_samples())
+    if len(affected) == 0:
+        return pd.Series(categories, index=variants_df.index)
+
+    males = pedigree.index(
+        [s for s in pedigree.unaffected_samples() if pedigree.sex[s] == MALE]
+    )
+    females = pedigree.index(
+        [s for s in pedigree.unaffected_samples() if pedigree.sex[s] != MALE]
+    )
+    # genotyped parents of affected samples
+    parents = pedigree.index(
+        sorted(
+            {
+                parent
+                for s in pedigree.affected
+                for parent in (pedigree.mother[s], pedigree.father[s])
+                if parent in pedigree.samples
+            }
+        )
+    )
+    trios = [tuple(pedigree.index(trio)) for trio in pedigree.trios(pedigree.affected_samples())]
+
+    chromosome = variants.encode_chromosome(variants_df["Position"])
+    x_categories = chromosome.cat.categories.str.contains("X")
+    codes = chromosome.cat.codes.to_numpy()
+    on_x = np.append(x_categories, False)[codes]
+    off_x = np.append(~x_categories, False)[codes]
+
+    carried = _all(matrix, affected, lambda m: m >= HET)
+    all_hom = _all(matrix, affected, lambda m: m == HOM)
+    all_het = _all(matrix, affected, lambda m: m == HET)
+    no_unaffected = _all(matrix, unaffected, lambda m: m <= ABSENT)
+    no_unaffected_hom = ~_any(matrix, unaffected, lambda m: m == HOM)
+
+    categories[
+        off_x
+        & all_hom
+        & no_unaffected_hom
+        & _all(matrix, parents, lambda m: (m == HET) | (m == UNKNOWN))
+    ] |= AUTOSOMAL_RECESSIVE
+    categories[
+        on_x
+        & all_hom
+        & ~_any(matrix, males, lambda m: m >= HET)
+        & ~_any(matrix, females, lambda m: m == HOM)
+    ] |= X_LINKED
+    categories[carried & no_unaffected] |= SHARED_BY_AFFECTED
+
+    gene_codes, genes = pd.factorize(variants_df["Gene"])
+    if trios:
+        de_novo = carried & no_unaffected
+        compound = all_het.copy()
+        for child, mother, father in trios:
+            child_het = matrix[:, child] == HET
+            maternal = child_het & (matrix[:, mother] == HET) & (matrix[:, father] == ABSENT)
+            paternal = child_het & (matrix[:, mother] == ABSENT) & (matrix[:, father] == HET)
+            parents_absent = (matrix[:, mother] == ABSENT) & (matrix[:, father] == ABSENT)
+            de_novo &= parents_absent
+            de_novo_het = child_het & parents_absent
+            compound &= (maternal | paternal | de_novo_het) & (
+                (
+                    _gene_has(gene_codes, maternal, len(genes))
+                    & _gene_has(gene_codes, paternal, len(genes))
+                )
+                | _gene_has(gene_codes, de_novo_het, len(genes))
+            )
+        categories[de_novo] |= DE_NOVO
+    else:
+        known = gene_codes >= 0
+        counts = np.bincount(gene_codes[all_het & known], minlength=len(genes))
+        compound = all_het & known & (counts[np.maximum(gene_codes, 0)] >= 2)
+    categories[compound] |= COMPOUND_HET
+
+    return pd.Series(categories, index=variants_df.index)
+
+
+# tab name, category and sort order of each segregation tab
+PEDIGREE_TABS = [
+    ("De_novo", DE_NOVO, ["omim_phenotype", "Gene"]),
+    ("Autosomal_recessive", AUTOSOMAL_RECESSIVE, ["omim_phenotype", "Gene"]),
+    ("Compound_heterozygous", COMPOUND_HET, ["omim_phenotype", "Gene"]),
+    ("X_linked", X_LINKED, ["omim_phenotype", "Gene"]),
+    ("Shared_by_affected", SHARED_BY_AFFECTED, ["omim_inheritance", "Gnomad_ac"]),
+]
+
+
+def pedigree_tabs(variants_df, pedigree, categories=None, view=False):
+    """
+    Returns a dict of tab name to the variants segregating with each rule, as
+    views.RowView of variants_df with view=True.
+    """
+    if categories is None:
+        categories = segregate(variants_df, pedigree)
+    return {
+        name: variants.tab(
+            variants_df, variants.select_rows(categories, category), sort, view
+        )
+        for name, category, sort in PEDIGREE_TABS
+    }
@@ -0,0 +1,133 @@
+import codecs
+import re
+import pandas as pd
+from group_variants import scores
+
+# bytes read from the start of a report to guess its delimiter and encoding
+SNIFF_BYTES = 64 * 1024
+
+# pandas' default missing value markers, except "None", which reports use as a
+# score sentinel that summary_field and the filters expect to see as a string
+NA_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "n/a",
+    "nan",
+    "null",
+]
+
+# explicit dtypes for columns every C4R report shares, so every chunk is parsed
+# the same way. Score columns mix numbers with "None"/"." sentinels, so they are
+# kept as text. Counts are nullable integers, so a count is shown as "12" even in
+# a column with missing values, where a float column would show "12.0"
+REPORT_DTYPES = {
+    "Cadd_score": str,
+    "Sift_score": str,
+    "Polyphen_score": str,
+    "Vest3_score": str,
+    "Revel_score": str,
+    "Exac_pli_score": str,
+    "Gnomad_ac": "Int32",
+    "Gnomad_hom": "Int32",
+    "C4R_WES_counts": "Int32",
+    "Frequency_in_C4R": "Int32",
+}
+
+# text columns with few distinct values, stored as categoricals
+REPORT_CATEGORIES = ["Gene", "Variation", "Clinvar", "omim_inheritance"]
+
+# count columns of reports built some other way than read_report, narrowed to
+# int32 when they have no missing values
+COUNT_COLUMNS = ["Gnomad_hom", "C4R_WES_counts", "Frequency_in_C4R"]
+
+
+def report_name(path):
+    # output file prefix: the report name without its .csv, e.g. 1234.wes.csv -> 1234.wes
+    return re.sub(r"\.csv$", "", path)
+
+
+def sniff(path):
+    """
+    Guesses the delimiter and encoding of a report from its first few KB and returns
+    (sep, encoding, columns). Reports are latin-1 unless they start with a UTF-8 BOM.
+    """
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+    if head.startswith(codecs.BOM_UTF8):
+        encoding = "utf-8-sig"
+    else:
+        encoding = "latin1"
+    header = head.decode(encoding, errors="replace").splitlines()[0]
+    if header.count("\t") > header.count(","):
+        sep = "\t"
+    else:
+        sep = ","
+    columns = [column.strip('"') for column in header.split(sep)]
+    return sep, encoding, columns
+
+
+def report_dtypes(columns):
+    dtypes = {}
+    for column in columns:
+        if column.startswith("Zygosity.") or column in REPORT_CATEGORIES:
+            dtypes[column] = "category"
+        elif column.startswith("Burden."):
+            dtypes[column] = "Int32"
+        elif column in REPORT_DTYPES:
+            dtypes[column] = REPORT_DTYPES[column]
+    return dtypes
+
+
+def compact(report):
+    """
+    Applies the compact dtypes of the C4R report schema to a report built some
+    other way than read_report, and narrows its integer count columns. Columns
+    outside the schema are left as they are.
+    """
+    for column in report.columns:
+        if column.startswith("Zygosity.") or column in REPORT_CATEGORIES:
+            if report[column].dtype != "category":
+                report[column] = report[column].astype("category")
+        elif column in COUNT_COLUMNS and report[column].dtype == "int64":
+            report[column] = report[column].astype("int32")
+    return report
+
+
+def read_report(path, chunksize=None):
+    """
+    Reads a csv or tsv variant report with the compact dtypes of the report
+    schema and its score columns normalized by scores.normalize. With chunksize,
+    returns an iterator of DataFrames of at most chunksize rows instead of
+    loading the whole report.
+    """
+    sep, encoding, columns = sniff(path)
+    return parse_report(path, sep, encoding, columns, chunksize)
+
+
+def parse_report(source, sep, encoding, columns, chunksize=None):
+    # read_report on a path or buffer whose delimiter, encoding and columns are known
+    report = pd.read_csv(
+        source,
+        sep=sep,
+        encoding=encoding,
+        dtype=report_dtypes(columns),
+        keep_default_na=False,
+        na_values=NA_VALUES,
+        chunksize=chunksize,
+    )
+    if chunksize is None:
+        return scores.normalize(compact(report))
+    return (scores.normalize(compact(chunk)) for chunk in report)
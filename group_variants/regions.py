@@ -0,0 +1,248 @@
+import array
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from group_variants import reader, vcf
+
+# bumped whenever the layout of the indexed file or its index changes
+INDEX_VERSION = 1
+
+# variants per compressed block; a query decompresses whole blocks
+BLOCK_ROWS = 2000
+
+# rows read at a time while splitting a report by chromosome
+CHUNK_ROWS = 200000
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+def is_indexed(path):
+    return os.path.exists(index_path(path))
+
+
+def report_name(path):
+    # the indexed file of report.csv is report.csv.gz
+    return path[: -len(".gz")] if path.endswith(".gz") else path
+
+
+def contig_name(chrom):
+    return chrom[3:] if chrom.lower().startswith("chr") else chrom
+
+
+def split_position(position):
+    # "1:12345" into chromosome and integer position; unparseable positions are -1
+    parts = position.str.split(":", n=1)
+    chrom = parts.str[0].fillna("")
+    pos = pd.to_numeric(parts.str[1], errors="coerce").fillna(-1).astype(np.int64)
+    return chrom, pos
+
+
+def parse_region(region):
+    """
+    Parses chrom, chrom:pos or chrom:start-end into (chromosome, start, end),
+    1-based and inclusive. Commas in positions are ignored.
+    """
+    chrom, _, span = region.replace(",", "").partition(":")
+    if not span:
+        return contig_name(chrom), 0, np.iinfo(np.int64).max
+    start, _, end = span.partition("-")
+    return contig_name(chrom), int(start), int(end or start)
+
+
+def _compress(text, encoding):
+    # each block is a complete gzip member, so the file is still a valid .gz
+    return gzip.compress(text.encode(encoding), compresslevel=6)
+
+
+def _records(f):
+    # rows of a delimited file as their raw text, joining lines of quoted fields that span several
+    record = ""
+    for line in f:
+        record += line
+        if record.count('"') % 2 == 0:
+            yield record if record.endswith("\n") else record + "\n"
+            record = ""
+    if record:
+        yield record + "\n"
+
+
+def _fields(record, sep):
+    if '"' not in record:
+        return record.rstrip("\r\n").split(sep)
+    return next(csv.reader([record], delimiter=sep))
+
+
+def index_report(path, output=None, block_rows=BLOCK_ROWS):
+    """
+    Writes a report sorted by Position as blocks of block_rows variants, each a
+    separate gzip member, to output (path + ".gz" by default), and an index of
+    each block's byte range, chromosome, positions and genes next to it. Rows
+    are copied as they are written in the report, and split by chromosome into
+    temporary files first, so only one chromosome is held in memory at a time.
+    Returns the index.
+    """
+    if output is None:
+        output = path + ".gz"
+    sep, read_encoding, columns = reader.sniff(path)
+    # blocks are written without a byte order mark
+    encoding = "utf-8" if read_encoding == "utf-8-sig" else read_encoding
+    position_column = columns.index("Position")
+    gene_column = columns.index("Gene")
+    index = {
+        "version": INDEX_VERSION,
+        "source": os.path.abspath(path),
+        "sep": sep,
+        "encoding": encoding,
+        "columns": columns,
+        "blocks": [],
+        "genes": {},
+    }
+
+    tmp = tempfile.mkdtemp(prefix="report_index_", dir=os.path.dirname(os.path.abspath(output)))
+    try:
+        # per chromosome: temporary file, positions and gene numbers of its rows
+        chromosomes = {}
+        genes = {}
+        with open(path, encoding=read_encoding, newline="") as f:
+            records = _records(f)
+            header = next(records)
+            for record in records:
+                if not record.strip():
+                    continue
+                fields = _fields(record, sep)
+                chrom, _, pos = fields[position_column].partition(":")
+                if chrom not in chromosomes:
+                    chromosomes[chrom] = (
+                        open(
+                            os.path.join(tmp, "%d.csv" % len(chromosomes)),
+                            "w",
+                            encoding=encoding,
+                            newline="",
+                        ),
+                        array.array("q"),
+                        array.array("i"),
+                    )
+                rows, positions, row_genes = chromosomes[chrom]
+                rows.write(record)
+                positions.append(int(pos) if pos.isdigit() else -1)
+                row_genes.append(genes.setdefault(fields[gene_column], len(genes)))
+        gene_names = np.array(list(genes), dtype=object)
+
+        with open(output + ".tmp", "wb") as f:
+            data = _compress(header, encoding)
+            f.write(data)
+            index["header"] = [0, len(data)]
+            offset = len(data)
+            for chrom in sorted(chromosomes, key=lambda chrom: vcf.contig_key(chrom, {})):
+                rows, positions, row_genes = chromosomes.pop(chrom)
+                rows.close()
+                with open(rows.name, encoding=encoding, newline="") as g:
+                    rows = list(_records(g))
+                positions = np.frombuffer(positions, dtype=np.int64)
+                order = np.argsort(positions, kind="stable")
+                positions = positions[order]
+                row_genes = np.frombuffer(row_genes, dtype=np.int32)[order]
+                for start in range(0, len(rows), block_rows):
+                    block = order[start : start + block_rows]
+                    data = _compress("".join([rows[row] for row in block]), encoding)
+                    f.write(data)
+                    number = len(index["blocks"])
+                    index["blocks"].append(
+                        [
+                            offset,
+                            len(data),
+                            len(block),
+                            contig_name(chrom),
+                            int(positions[start]),
+                            int(positions[start + len(block) - 1]),
+                        ]
+                    )
+                    offset += len(data)
+                    for gene in gene_names[np.unique(row_genes[start : start + block_rows])]:
+                        index["genes"].setdefault(gene, []).append(number)
+        os.replace(output + ".tmp", output)
+    finally:
+        for rows, _, _ in chromosomes.values():
+            rows.close()
+        shutil.rmtree(tmp)
+
+    with open(index_path(output) + ".tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(index_path(output) + ".tmp", index_path(output))
+    return index
+
+
+def load_index(path):
+    with open(index_path(path)) as f:
+        index = json.load(f)
+    if index["version"] != INDEX_VERSION:
+        raise ValueError("%s was indexed by another version, index it again" % path)
+    return index
+
+
+def select_blocks(index, genes=None, regions=None):
+    """
+    Returns the numbers of the blocks holding any of genes or overlapping any
+    region from parse_region, in file order. Without either, every block.
+    """
+    if genes is None and regions is None:
+        return list(range(len(index["blocks"])))
+    selected = set()
+    for gene in genes or []:
+        selected.update(index["genes"].get(gene, []))
+    for chrom, start, end in regions or []:
+        selected.update(
+            number
+            for number, (_, _, _, block_chrom, block_start, block_end) in enumerate(
+                index["blocks"]
+            )
+            if block_chrom == chrom and block_start <= end and block_end >= start
+        )
+    return sorted(selected)
+
+
+def read_report(path, genes=None, regions=None):
+    """
+    Reads the variants of an indexed report in any of genes or regions (strings
+    like "1:1000-2000"), decompressing only the blocks that can hold them. The
+    result has the dtypes and normalized scores of reader.read_report. Without
+    genes or regions the whole report is read.
+    """
+    index = load_index(path)
+    blocks = select_blocks(
+        index, genes, [parse_region(region) for region in regions] if regions is not None else None
+    )
+    with open(path, "rb") as f:
+        data = []
+        for number in [None] + blocks:
+            offset, length = index["header"] if number is None else index["blocks"][number][:2]
+            f.seek(offset)
+            data.append(gzip.decompress(f.read(length)))
+    report = reader.parse_report(
+        io.BytesIO(b"".join(data)), index["sep"], index["encoding"], index["columns"]
+    )
+    return select_variants(report, genes, regions)
+
+
+def select_variants(report, genes=None, regions=None):
+    # the variants of a report in any of genes or regions; blocks also hold their neighbours
+    if genes is None and regions is None:
+        return report
+    keep = np.zeros(len(report), dtype=bool)
+    if genes:
+        keep |= report["Gene"].isin(genes).to_numpy()
+    if regions:
+        chrom, pos = split_position(report["Position"].astype(object))
+        chrom = chrom.map(contig_name).to_numpy()
+        pos = pos.to_numpy()
+        for region_chrom, start, end in map(parse_region, regions):
+            keep |= (chrom == region_chrom) & (pos >= start) & (pos <= end)
+    return report.iloc[np.flatnonzero(keep)].reset_index(drop=True)
@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+
+# prediction score columns that mix numbers with "None"/"." sentinels
+SCORE_COLUMNS = [
+    "Cadd_score",
+    "Sift_score",
+    "Polyphen_score",
+    "Vest3_score",
+    "Revel_score",
+    "Exac_pli_score",
+]
+
+# what each score value was before normalization. Sentinels are kept so reports
+# are written and summarized with the original text
+NUMBER, NONE, DOT, MISSING = 0, 1, 2, 3
+SENTINEL_TEXT = {NONE: "None", DOT: "."}
+
+
+def sentinel_column(column):
+    # int8 companion column holding the sentinel codes of a normalized score column
+    return "%s.sentinel" % column
+
+
+def exact_column(column):
+    # categorical companion column holding the text of the few scores that float32
+    # does not show as written, e.g. "30.0" or "0.9499999999"
+    return "%s.exact" % column
+
+
+def companion_columns(column):
+    return [sentinel_column(column), exact_column(column)]
+
+
+def is_companion_column(column):
+    return str(column).endswith((".sentinel", ".exact"))
+
+
+def is_normalized(report, column):
+    return sentinel_column(column) in report.columns
+
+
+def number_text(values):
+    # shortest text that reads back as the same float32, without a trailing ".0";
+    # scores repeat a lot, so each distinct value is formatted once
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    text = uniques.astype(np.float32).astype(str)
+    text = np.array([str(t[:-2] if t.endswith(".0") else t) for t in text], dtype=object)
+    return text[codes]
+
+
+def parse(column):
+    """
+    Parses a score column into (float32 values, int8 sentinel codes, exact text).
+    Sentinels, missing and unparseable values are NaN. Exact text is a
+    Categorical holding the value as written where number_text would show it
+    differently, and NaN everywhere else.
+    """
+    column = pd.Series(column)
+    sentinels = np.full(len(column), NUMBER, dtype=np.int8)
+    sentinels[(column == "None").to_numpy(dtype=bool, na_value=False)] = NONE
+    sentinels[(column == ".").to_numpy(dtype=bool, na_value=False)] = DOT
+    sentinels[column.isnull().to_numpy()] = MISSING
+    try:
+        # much faster than to_numeric when every other value is a number
+        values = column.mask(sentinels != NUMBER, "nan").to_numpy(dtype=object)
+        values = values.astype(np.float32)
+    except (TypeError, ValueError):
+        values = pd.to_numeric(column.mask(sentinels != NUMBER), errors="coerce")
+        values = values.to_numpy(dtype=np.float32, na_value=np.nan)
+        sentinels[(sentinels == NUMBER) & np.isnan(values)] = MISSING
+    text = column.to_numpy(dtype=object, na_value=None)
+    if not pd.api.types.is_string_dtype(column.dtype):
+        # numbers read as numbers are shown as str() shows them
+        text = np.array([None if t is None else str(t) for t in text], dtype=object)
+    exact = np.zeros(len(column), dtype=bool)
+    numbers = sentinels == NUMBER
+    exact[numbers] = text[numbers] != number_text(values[numbers])
+    # unparseable values are kept as written too
+    exact |= (sentinels == MISSING) & column.notnull().to_numpy()
+    # only the exact rows are factorized; every other row gets the missing code
+    codes, uniques = pd.factorize(text[exact])
+    exact_codes = np.full(len(column), -1, dtype=np.int64)
+    exact_codes[exact] = codes
+    return values, sentinels, pd.Categorical.from_codes(exact_codes, pd.Index(uniques, dtype="str"))
+
+
+def normalize(report):
+    """
+    Converts every score column of a report to float32 once, adding its sentinel
+    codes and exact text as columns next to it. Already normalized columns are
+    kept.
+    """
+    for column in SCORE_COLUMNS:
+        if column in report.columns and not is_normalized(report, column):
+            values, sentinels, exact = parse(report[column])
+            report[column] = values
+            position = report.columns.get_loc(column)
+            report.insert(position + 1, sentinel_column(column), sentinels)
+            report.insert(position + 2, exact_column(column), exact)
+    return report
+
+
+def score_column(report, column):
+    """
+    Returns (float32 values, sentinel codes) of a score column, parsing it if
+    the report is not normalized.
+    """
+    if is_normalized(report, column):
+        return (
+            report[column].to_numpy(dtype=np.float32, na_value=np.nan),
+            report[sentinel_column(column)].to_numpy(),
+        )
+    return parse(report[column])[:2]
+
+
+def values(report, column):
+    return score_column(report, column)[0]
+
+
+def sentinels(report, column):
+    return score_column(report, column)[1]
+
+
+def exact_text(report, column):
+    # the exact text of a score column as objects, None where number_text shows it
+    if is_normalized(report, column):
+        return report[exact_column(column)].to_numpy(dtype=object, na_value=None)
+    return np.asarray(parse(report[column])[2].to_numpy(dtype=object, na_value=None))
+
+
+def _compare(values, comparison, threshold):
+    with np.errstate(invalid="ignore"):
+        if comparison == "ge":
+            return values >= threshold
+        elif comparison == "lt":
+            return values < threshold
+        return values > threshold
+
+
+def compare(report, column, comparison, threshold):
+    """
+    Boolean array of the scores of a column that are "ge", "gt" or "lt" the
+    threshold, as float() of the text as written compares. Thresholds are short
+    decimals, so a score shown by number_text equals one exactly when its
+    float32 does; scores with exact text are compared as float64.
+    """
+    result = _compare(values(report, column), comparison, np.float32(threshold))
+    exact = pd.Series(exact_text(report, column))
+    rows = np.flatnonzero(exact.notnull())
+    if len(rows):
+        exact = pd.to_numeric(exact.iloc[rows], errors="coerce").to_numpy(dtype=float)
+        result[rows] = _compare(exact, comparison, threshold)
+    return result
+
+
+def text(report, column, missing="nan"):
+    """
+    The display text of a score column: numbers as written, sentinels as
+    "None"/".", and missing values as missing.
+    """
+    if not is_normalized(report, column):
+        return report[column].to_numpy(dtype=object, na_value=np.nan).astype(str).astype(object)
+    numbers, codes = score_column(report, column)
+    result = number_text(numbers)
+    for code, sentinel in SENTINEL_TEXT.items():
+        result[codes == code] = sentinel
+    result[codes == MISSING] = missing
+    exact = exact_text(report, column)
+    written = pd.notnull(exact)
+    result[written] = exact[written]
+    return result
+
+
+def replace_sentinels(report, column, code):
+    # shows every non-numeric value of a normalized score column as one sentinel
+    numbers = sentinels(report, column) == NUMBER
+    return report.assign(
+        **{
+            sentinel_column(column): np.where(numbers, NUMBER, code).astype(np.int8),
+            exact_column(column): report[exact_column(column)].where(numbers),
+        }
+    )
+
+
+def display(report, as_text=False):
+    """
+    Returns a report for writing: normalized score columns back to numbers and
+    their sentinels, and the companion columns dropped. Numbers stay numeric for
+    Excel, or are written as they were in the report with as_text=True, e.g.
+    for csv output.
+    """
+    columns = [column for column in SCORE_COLUMNS if column in report.columns]
+    if not any(is_normalized(report, column) for column in columns):
+        return report
+    shown = {}
+    for column in columns:
+        if not is_normalized(report, column):
+            continue
+        shown[column] = text(report, column, missing=None)
+        if not as_text:
+            numbers = sentinels(report, column) == NUMBER
+            shown[column][numbers] = shown[column][numbers].astype(float)
+    report = report.assign(**shown)
+    return report[[column for column in report.columns if not is_companion_column(column)]]
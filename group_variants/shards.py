@@ -0,0 +1,177 @@
+import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from group_variants import scores, variants
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+# shards per process, so chromosomes of very different sizes still even out
+SHARDS_PER_PROCESS = 4
+
+# columns summary_fields reads besides the score columns and the C4R count
+SUMMARY_COLUMNS = ["Gnomad_ac", "Gnomad_hom", "Quality", "Refseq_change", "Variation", "Gene"]
+
+
+def shard_rows(position, processes):
+    """
+    Splits the rows of a report by chromosome, the prefix of Position, into
+    arrays of row positions, largest first. Chromosomes holding more than an
+    even share of the rows are split into runs of consecutive rows; once the
+    compound het genes of the whole report are known every category is
+    row-local, so any split classifies the same.
+    """
+    if len(position) == 0:
+        return []
+    # encode_chromosome with Arrow kernels, since this part runs before any process starts
+    chromosome = pyarrow.compute.list_element(
+        pyarrow.compute.split_pattern(pyarrow.array(position), ":", max_splits=1), 0
+    )
+    codes = chromosome.dictionary_encode().indices.fill_null(-1).to_numpy(zero_copy_only=False)
+    order = np.argsort(codes, kind="stable")
+    largest = math.ceil(len(position) / (processes * SHARDS_PER_PROCESS))
+    shards = []
+    for rows in np.split(order, np.flatnonzero(np.diff(codes[order])) + 1):
+        shards += np.array_split(rows, math.ceil(len(rows) / largest))
+    return sorted(shards, key=len, reverse=True)
+
+
+def shared_columns(report, proband, mother, father, c4r):
+    # the columns classify, and with c4r summary_fields, read, so only those are copied
+    columns = ["Position", "Gene", "omim_phenotype", "Panels", variants.get_burden(proband)]
+    columns += [variants.get_zygosity(sample) for sample in [proband, mother, father] if sample]
+    if c4r:
+        columns += SUMMARY_COLUMNS + [c4r]
+        for column in scores.SCORE_COLUMNS:
+            columns += [column] + scores.companion_columns(column)
+    return [column for column in report.columns if column in set(columns)]
+
+
+def share(frame):
+    """
+    Writes a frame as an Arrow IPC stream to a new shared memory block, which
+    worker processes read without copying. The caller unlinks the block.
+    """
+    table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+    size = pyarrow.MockOutputStream()
+    with pyarrow.ipc.new_stream(size, table.schema) as stream:
+        stream.write_table(table)
+    block = shared_memory.SharedMemory(create=True, size=max(size.size(), 1))
+    buffer = pyarrow.py_buffer(block.buf)
+    with pyarrow.ipc.new_stream(pyarrow.FixedSizeBufferWriter(buffer), table.schema) as stream:
+        stream.write_table(table)
+    # the block cannot be closed while Arrow still holds a view of it
+    del buffer
+    return block
+
+
+# categories of the shared categorical columns, built once per worker process
+# rather than for every shard
+_categories = {}
+
+
+def read_shard(name, rows, columns=None):
+    # rows of the frame shared by share as a DataFrame of the worker's own
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        table = pyarrow.ipc.open_stream(pyarrow.py_buffer(block.buf)).read_all()
+        if columns is not None:
+            table = table.select([column for column in columns if column in table.column_names])
+        table = table.take(rows)
+        categorical = [
+            field.name for field in table.schema if pyarrow.types.is_dictionary(field.type)
+        ]
+        shard = table.drop_columns(categorical).to_pandas()
+        for column in categorical:
+            values = table.column(column).combine_chunks()
+            if (name, column) not in _categories:
+                # copied out, since the dictionary is still a view of the block
+                _categories[name, column] = pd.CategoricalDtype(
+                    pd.Index(values.dictionary.to_numpy(zero_copy_only=False)),
+                    ordered=values.type.ordered,
+                )
+            shard[column] = pd.Categorical.from_codes(
+                values.indices.fill_null(-1).to_numpy(zero_copy_only=False),
+                dtype=_categories[name, column],
+            )
+        shard = shard[table.column_names]
+        del table, values
+    finally:
+        block.close()
+    return shard
+
+
+def _compound_het_genes(name, rows, proband, mother, father):
+    columns = [variants.get_zygosity(sample) for sample in [proband, mother, father]]
+    shard = read_shard(name, rows, columns + [variants.get_burden(proband), "Gene"])
+    return variants.compound_het_genes(shard, proband, mother, father)
+
+
+def _classify(name, rows, proband, mother, father, report_type, compound_genes, c4r):
+    shard = read_shard(name, rows)
+    categories = variants.classify(
+        shard, proband, mother, father, report_type, compound_genes
+    ).to_numpy()
+    summary = variants.summary_fields(shard, c4r).to_numpy() if c4r else None
+    return rows, categories, summary
+
+
+def classify(report, proband, mother, father, report_type, processes, c4r=None):
+    """
+    variants.classify, and with c4r the summary_fields, of a report computed per
+    chromosome on a pool of processes that read its columns from shared memory.
+    For trios, the compound het genes of every shard are joined first, so the
+    categories are those of classifying the whole report. Returns (categories,
+    summary or None), aligned to the report index. Without pyarrow, runs in
+    this process.
+    """
+    if pyarrow is None:
+        print("pyarrow is not installed, classifying on one process")
+        categories = variants.classify(report, proband, mother, father, report_type)
+        return categories, variants.summary_fields(report, c4r) if c4r else None
+
+    categories = np.zeros(len(report), dtype=np.uint8)
+    summary = np.empty(len(report), dtype=object) if c4r else None
+    block = share(report[shared_columns(report, proband, mother, father, c4r)])
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            shards = shard_rows(report["Position"], processes)
+            compound_genes = None
+            if report_type == "trio" and variants.get_burden(proband) in report.columns:
+                maternal, paternal, de_novo = set(), set(), set()
+                futures = [
+                    executor.submit(_compound_het_genes, block.name, rows, proband, mother, father)
+                    for rows in shards
+                ]
+                for future in as_completed(futures):
+                    shard_maternal, shard_paternal, shard_de_novo = future.result()
+                    maternal |= shard_maternal
+                    paternal |= shard_paternal
+                    de_novo |= shard_de_novo
+                compound_genes = (maternal & paternal) | de_novo
+
+            futures = [
+                executor.submit(
+                    _classify, block.name, rows, proband, mother, father, report_type, compound_genes, c4r
+                )
+                for rows in shards
+            ]
+            for future in as_completed(futures):
+                rows, shard_categories, shard_summary = future.result()
+                categories[rows] = shard_categories
+                if c4r:
+                    summary[rows] = shard_summary
+    finally:
+        block.close()
+        block.unlink()
+
+    categories = pd.Series(categories, index=report.index)
+    if c4r:
+        summary = pd.Series(summary, index=report.index, dtype=object)
+    return categories, summary
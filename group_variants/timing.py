@@ -0,0 +1,125 @@
+import json
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class Stage:
+    def __init__(self, name, rows_in):
+        self.name = name
+        self.seconds = 0.0
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.peak_rss_mb = None
+
+
+class _NoStage:
+    # shared by every stage of a disabled timer; setting rows_out is a no-op
+    rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+NO_STAGE = _NoStage()
+
+
+class _RunningStage:
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.stage
+
+    def __exit__(self, *exc):
+        self.stage.seconds += time.perf_counter() - self.start
+        self.stage.peak_rss_mb = peak_rss_mb()
+        return False
+
+
+class StageTimer:
+    """
+    Records wall time, peak RSS and rows in/out for named stages of a script:
+
+        with timer.stage("summary", len(report)) as stage:
+            ...
+            stage.rows_out = len(report)
+
+    Repeating a stage name, e.g. once per chunk, adds to the same record. A
+    disabled timer does no timing and writes nothing.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+        self.start = time.perf_counter()
+
+    def stage(self, name, rows_in=None):
+        if not self.enabled:
+            return NO_STAGE
+        if name not in self.stages:
+            self.stages[name] = Stage(name, rows_in)
+        elif rows_in is not None:
+            self.stages[name].rows_in = (self.stages[name].rows_in or 0) + rows_in
+        return _RunningStage(self.stages[name])
+
+    def iterate(self, name, chunks):
+        # times each step of an iterator, such as reading a report chunk by chunk
+        if not self.enabled:
+            return chunks
+        return self._iterate(name, chunks)
+
+    def _iterate(self, name, chunks):
+        chunks = iter(chunks)
+        while True:
+            with self.stage(name) as stage:
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    stage.rows_out = (stage.rows_out or 0) + len(chunk)
+            if chunk is None:
+                return
+            yield chunk
+
+    def results(self):
+        return {
+            "total_seconds": round(time.perf_counter() - self.start, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": [
+                {
+                    "stage": stage.name,
+                    "seconds": round(stage.seconds, 3),
+                    "rows_in": stage.rows_in,
+                    "rows_out": stage.rows_out,
+                    "peak_rss_mb": stage.peak_rss_mb,
+                }
+                for stage in self.stages.values()
+            ],
+        }
+
+    def write(self, path):
+        """
+        Writes the recorded stages as a json sidecar and logs them as one json line.
+        """
+        if not self.enabled:
+            return
+        results = self.results()
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(json.dumps(dict(results, timings=path)))
@@ -1,5 +1,6 @@
+import numpy as np
 import pandas as pd
-import argparse
+from group_variants import scores, views
 
 
 def get_zygosity(sample_id):
@@ -12,138 +13,215 @@ def get_burden(sample_id):
     return burden
 
 
-def autosomal_recessive(variants, proband, mother, father, report_type):
-    if report_type == "singleton":
-        variants_filtered = variants[
-            (variants[get_zygosity(proband)] == "Hom")
-            & (variants["Position"].str.contains("X") == False)
-        ]
-        variants_filtered = variants_filtered.sort_values(["omim_phenotype", "Gene"])
-    elif report_type == "trio":
-        variants_filtered = variants[
-            (variants[get_zygosity(proband)] == "Hom")
-            & (variants[get_zygosity(mother)] == "Het")
-            & (variants[get_zygosity(father)] == "Het")
-        ]
-    return variants_filtered
+# inheritance categories, one bit each in the mask returned by classify
+AUTOSOMAL_RECESSIVE = 1
+COMPOUND_HET = 2
+HEMIZYGOUS = 4
+DOMINANT_OMIM = 8
+DE_NOVO = 16
+DOMINANT_NONOMIM = 32
+PANEL = 64
+# set alongside HEMIZYGOUS for trio variants inherited from the father
+HEMIZYGOUS_PATERNAL = 128
+
+# small integer codes for Zygosity.* values; anything else is encoded as -1
+ZYGOSITY_LEVELS = ["-", "Het", "Hom"]
+ABSENT, HET, HOM = 0, 1, 2
+
+
+def encode_zygosity(column):
+    return pd.Categorical(column, categories=ZYGOSITY_LEVELS).codes
+
+
+def encode_chromosome(position):
+    # chromosome prefix of Position (e.g. "X:153005605") as a categorical
+    return position.str.split(":", n=1).str[0].astype("category")
+
+
+def _compound_het_genes(genes, burdened, het, maternal, paternal, parents_absent):
+    # (maternal, paternal, de novo) sets of genes with burdened variants of each origin
+    return (
+        set(genes[burdened & maternal]),
+        set(genes[burdened & paternal]),
+        set(genes[burdened & het & parents_absent]),
+    )
+
+
+def compound_het_genes(variants, proband, mother, father):
+    """
+    The sets of genes with burdened variants inherited from the mother, from the
+    father, and burdened het de novo variants in a trio. Sets from parts of a
+    report can be joined and passed to classify as compound_genes.
+    """
+    het = encode_zygosity(variants[get_zygosity(proband)]) == HET
+    mother_zygosity = encode_zygosity(variants[get_zygosity(mother)])
+    father_zygosity = encode_zygosity(variants[get_zygosity(father)])
+    burdened = (variants[get_burden(proband)] >= 2).to_numpy(dtype=bool, na_value=False)
+    return _compound_het_genes(
+        variants["Gene"],
+        burdened,
+        het,
+        (mother_zygosity == HET) & (father_zygosity == ABSENT),
+        (mother_zygosity == ABSENT) & (father_zygosity == HET),
+        (mother_zygosity == ABSENT) & (father_zygosity == ABSENT),
+    )
+
 
+def classify(variants, proband, mother, father, report_type, compound_genes=None):
+    """
+    Computes every inheritance category for each variant in one pass and returns
+    them as a bitmask Series aligned to the variants index. Zygosity columns are
+    encoded once into integer codes and the chromosome into a categorical.
+    Trio compound het variants are those in compound_genes, e.g. joined from
+    compound_het_genes of every part of a report; by default the genes are
+    taken from these variants.
+    """
+    categories = np.zeros(len(variants), dtype=np.uint8)
+    proband_zygosity = encode_zygosity(variants[get_zygosity(proband)])
+    het = proband_zygosity == HET
+    hom = proband_zygosity == HOM
+
+    # missing positions are neither on nor off the X chromosome
+    chromosome = encode_chromosome(variants["Position"])
+    x_categories = chromosome.cat.categories.str.contains("X")
+    codes = chromosome.cat.codes.to_numpy()
+    on_x = np.append(x_categories, False)[codes]
+    off_x = np.append(~x_categories, False)[codes]
+
+    omim_phenotype = variants["omim_phenotype"]
+    omim = (omim_phenotype.notnull() & (omim_phenotype != ".")).to_numpy()
+    categories[het & omim] |= DOMINANT_OMIM
+    categories[het & ~omim] |= DOMINANT_NONOMIM
+
+    if "Panels" in variants.columns:
+        panels = variants["Panels"].notnull().to_numpy()
+        categories[(het | hom) & panels] |= PANEL
+
+    burden = get_burden(proband)
+    if burden in variants.columns:
+        burdened = (variants[burden] >= 2).to_numpy(dtype=bool, na_value=False)
+        compound = burdened & het
+    else:
+        compound = np.zeros(len(variants), dtype=bool)
 
-def hemizygous(variants, proband, mother, father, report_type):
     if report_type == "singleton":
-        variants_filtered = variants[
-            (variants[get_zygosity(proband)] == "Hom")
-            & (variants["Position"].str.contains("X") == True)
-        ]
+        categories[hom & off_x] |= AUTOSOMAL_RECESSIVE
+        categories[hom & on_x] |= HEMIZYGOUS
     elif report_type == "trio":
-        variants_filtered = variants[(variants[get_zygosity(proband)] == "Hom")]
-        # hemizygous variants inherited from mom
-        variants_filtered_mat = variants_filtered[
-            (variants_filtered[get_zygosity(mother)] == "Het")
-            & (variants_filtered[get_zygosity(father)] == "-")
-        ]
-        # hemizygous variants inherited from dad
-        variants_filtered_pat = variants_filtered[
-            (variants_filtered[get_zygosity(mother)] == "-")
-            & (variants_filtered[get_zygosity(father)] == "Het")
-        ]
-        variants_filtered = pd.concat(
-            [variants_filtered_mat, variants_filtered_pat], ignore_index=True
-        )
-    variants_filtered = variants_filtered.sort_values(["omim_phenotype", "Gene"])
-    return variants_filtered
-
-
-def dominant_nonOMIM(variants, proband):
-    variants_filtered = variants[(variants[get_zygosity(proband)] == "Het")]
-    variants_filtered = variants_filtered[
-        (variants_filtered["omim_phenotype"] != variants_filtered["omim_phenotype"])
-        | (variants_filtered["omim_phenotype"] == ".")
-    ]
-    variants_filtered = variants_filtered.sort_values(["Gnomad_ac", "Gene"])
-    return variants_filtered
-
-
-def denovo(variants, proband, mother, father):
-    variants_filtered = variants[
-        (variants[get_zygosity(proband)] == "Het")
-        | (variants[get_zygosity(proband)] == "Hom")
-    ]
-    variants_filtered = variants_filtered[
-        (variants_filtered[get_zygosity(mother)] == "-")
-        & (variants_filtered[get_zygosity(father)] == "-")
-    ]
-    variants_filtered = variants_filtered.sort_values(["omim_phenotype", "Gene"])
-    return variants_filtered
-
-
-def compound_het(variants, proband, mother, father, report_type):
+        mother_zygosity = encode_zygosity(variants[get_zygosity(mother)])
+        father_zygosity = encode_zygosity(variants[get_zygosity(father)])
+        maternal = (mother_zygosity == HET) & (father_zygosity == ABSENT)
+        paternal = (mother_zygosity == ABSENT) & (father_zygosity == HET)
+        parents_absent = (mother_zygosity == ABSENT) & (father_zygosity == ABSENT)
+
+        categories[
+            hom & (mother_zygosity == HET) & (father_zygosity == HET)
+        ] |= AUTOSOMAL_RECESSIVE
+        categories[hom & maternal] |= HEMIZYGOUS
+        categories[hom & paternal] |= HEMIZYGOUS | HEMIZYGOUS_PATERNAL
+        categories[(het | hom) & parents_absent] |= DE_NOVO
+
+        # compound het: genes with burdened het variants from both parents, or
+        # with a burdened de novo het variant anywhere in the report
+        if burden in variants.columns:
+            genes = variants["Gene"]
+            if compound_genes is None:
+                mat_genes, pat_genes, de_novo_genes = _compound_het_genes(
+                    genes, burdened, het, maternal, paternal, parents_absent
+                )
+                compound_genes = (mat_genes & pat_genes) | de_novo_genes
+            compound &= genes.isin(compound_genes).to_numpy()
+    categories[compound] |= COMPOUND_HET
+
+    return pd.Series(categories, index=variants.index)
+
+
+def select_rows(categories, category):
+    return np.flatnonzero(np.asarray(categories) & category)
+
+
+def select(variants, categories, category):
+    return variants.iloc[select_rows(categories, category)]
+
+
+def tab(variants, rows, sort=None, view=False):
+    """
+    The tab holding rows of variants, sorted by the sort columns. With view=True
+    it is a views.RowView of variants instead of a copy of its rows.
+    """
+    if sort:
+        rows = views.sort_rows(variants, rows, sort)
+    if view:
+        return views.RowView(variants, rows)
+    return variants.iloc[rows]
+
+
+def autosomal_recessive(
+    variants, proband, mother, father, report_type, categories=None, view=False
+):
+    if categories is None:
+        categories = classify(variants, proband, mother, father, report_type)
+    rows = select_rows(categories, AUTOSOMAL_RECESSIVE)
+    sort = ["omim_phenotype", "Gene"] if report_type == "singleton" else None
+    return tab(variants, rows, sort, view)
+
+
+def hemizygous(
+    variants, proband, mother, father, report_type, categories=None, view=False
+):
+    if categories is None:
+        categories = classify(variants, proband, mother, father, report_type)
+    rows = select_rows(categories, HEMIZYGOUS)
+    if report_type == "trio":
+        # hemizygous variants inherited from mom, then those inherited from dad
+        paternal = (np.asarray(categories)[rows] & HEMIZYGOUS_PATERNAL) != 0
+        rows = np.concatenate([rows[~paternal], rows[paternal]])
+    return tab(variants, rows, ["omim_phenotype", "Gene"], view)
+
+
+def dominant_nonOMIM(variants, proband, categories=None, view=False):
+    if categories is None:
+        categories = classify(variants, proband, None, None, "singleton")
+    rows = select_rows(categories, DOMINANT_NONOMIM)
+    return tab(variants, rows, ["Gnomad_ac", "Gene"], view)
+
+
+def denovo(variants, proband, mother, father, categories=None, view=False):
+    if categories is None:
+        categories = classify(variants, proband, mother, father, "trio")
+    rows = select_rows(categories, DE_NOVO)
+    return tab(variants, rows, ["omim_phenotype", "Gene"], view)
+
+
+def compound_het(
+    variants, proband, mother, father, report_type, categories=None, view=False
+):
+    """
+    Variants in genes where the proband carries at least two variants (burden >= 2)
+    and is heterozygous. For trios, a het variant is kept when its gene has both a
+    maternally inherited and a paternally inherited het variant, or when the gene has
+    any de novo het variant in the proband; this does not depend on row order.
+    """
     # this function captures quite a bit of junky misaligned variants where
     # the burden is high in all samples.
-    variants_burden = variants[(variants[get_burden(proband)] >= 2)]
-    variants_burden_het = variants_burden[
-        (variants_burden[get_zygosity(proband)] == "Het")
-    ]
+    if categories is None:
+        categories = classify(variants, proband, mother, father, report_type)
+    rows = select_rows(categories, COMPOUND_HET)
+    return tab(variants, rows, ["omim_phenotype", "Gene"], view)
+
+
+def dominant_OMIM(variants, proband, categories=None, view=False):
+    if categories is None:
+        categories = classify(variants, proband, None, None, "singleton")
+    rows = select_rows(categories, DOMINANT_OMIM)
+    return tab(variants, rows, ["omim_inheritance", "Gnomad_ac"], view)
 
-    if report_type == "trio":
-        variants_filtered_mat = variants_burden[
-            (variants_burden[get_zygosity(mother)] == "Het")
-            & (variants_burden[get_zygosity(father)] == "-")
-        ]
-        variants_filtered_pat = variants_burden[
-            (variants_burden[get_zygosity(father)] == "Het")
-            & (variants_burden[get_zygosity(mother)] == "-")
-        ]
-
-        # now check to see if gene has het variants in both mother and father
-        denovo_genes = []
-        index_list = []
-        for index, variant in variants_burden_het.iterrows():
-            gene = variant["Gene"]
-            if (
-                gene in variants_filtered_mat["Gene"].tolist()
-                and gene in variants_filtered_pat["Gene"].tolist()
-            ):
-                index_list.append(index)
-            # include de novo variants_burden
-            elif (
-                variant[get_zygosity(proband)] == "Het"
-                and variant[get_zygosity(mother)] == "-"
-                and variant[get_zygosity(father)] == "-"
-            ):
-                index_list.append(index)
-                denovo_genes.append(variant["Gene"])
-            elif gene in denovo_genes:
-                index_list.append(index)
-            else:
-                pass
-        variants_burden_het = variants_burden.loc[index_list, :]
-
-    variants_burden_het = variants_burden_het.sort_values(["omim_phenotype", "Gene"])
-    return variants_burden_het
-
-
-def dominant_OMIM(variants, proband):
-    variants_filtered = variants[
-        (variants["omim_phenotype"] != ".")
-        & (
-            (variants["omim_phenotype"] == variants["omim_phenotype"])
-            | (variants["omim_phenotype"].notnull())
-        )
-        & (variants[get_zygosity(proband)] == "Het")
-    ]
-
-    variants_filtered = variants_filtered.sort_values(["omim_inheritance", "Gnomad_ac"])
-    return variants_filtered
-
-
-def panel(variants, proband):
-    variants_filtered = variants[
-        variants[get_zygosity(proband)].isin(["Het", "Hom"])
-        & (variants["Panels"] == variants["Panels"])
-    ]
-
-    variants_filtered = variants_filtered.sort_values(["omim_inheritance", "Gnomad_ac"])
-    return variants_filtered
+
+def panel(variants, proband, categories=None, view=False):
+    if categories is None:
+        categories = classify(variants, proband, None, None, "singleton")
+    rows = select_rows(categories, PANEL)
+    return tab(variants, rows, ["omim_inheritance", "Gnomad_ac"], view)
 
 
 def summary_field(
@@ -226,6 +304,103 @@ def summary_field(
     return summary
 
 
+# (column, comparison, threshold) for each in silico tool counted in the summary
+SUMMARY_TOOLS = [
+    ("Cadd_score", "ge", 15),
+    ("Sift_score", "lt", 0.05),
+    ("Polyphen_score", "gt", 0.446),
+    ("Vest3_score", "gt", 0.5),
+    ("Revel_score", "gt", 0.5),
+]
+
+
+def get_c4r_column(report):
+    # older reports name the C4R count column differently
+    if "C4R_WES_counts" in report.columns:
+        return "C4R_WES_counts"
+    return "Frequency_in_C4R"
+
+
+def _text(column):
+    # str() of every value, matching what str.format produces for a single row;
+    # missing values in nullable columns are shown as nan like float columns
+    values = column.to_numpy(dtype=object, na_value=np.nan)
+    return values.astype(str).astype(object)
+
+
+def _quality_text(column):
+    quality = pd.to_numeric(column, errors="coerce").to_numpy(dtype=float)
+    text = _text(column)
+    finite = np.isfinite(quality)
+    text[finite] = np.round(quality[finite]).astype(np.int64).astype(str)
+    return text
+
+
+def summary_fields(report, c4r=None):
+    """
+    Column-wise equivalent of summary_field: returns a Series of summary strings
+    for every variant in the report, aligned to the report index.
+    """
+    if c4r is None:
+        c4r = get_c4r_column(report)
+    num_tools = np.zeros(len(report), dtype=np.int64)
+    pathogenic_count = np.zeros(len(report), dtype=np.int64)
+    for column, comparison, threshold in SUMMARY_TOOLS:
+        sentinels = scores.sentinels(report, column)
+        predicted = (sentinels != scores.NONE) & (sentinels != scores.DOT)
+        impact = scores.compare(report, column, comparison, threshold)
+        num_tools += predicted
+        pathogenic_count += predicted & impact
+
+    summary = (
+        "CADD = "
+        + scores.text(report, "Cadd_score")
+        + "; "
+        + pathogenic_count.astype(str).astype(object)
+        + "/"
+        + num_tools.astype(str).astype(object)
+        + " tools predict an impact. "
+        + _text(report["Gnomad_ac"])
+        + " alleles and "
+        + _text(report["Gnomad_hom"])
+        + " homozygote(s) in gnomAD. Seen "
+        + _text(report[c4r])
+        + " time(s) in C4R. Quality: "
+        + _quality_text(report["Quality"])
+        + ". "
+        + _text(report["Refseq_change"])
+        + " is a "
+        + _text(report["Variation"])
+        + " variant in "
+        + _text(report["Gene"])
+        + ". Gene plI: "
+        + scores.text(report, "Exac_pli_score")
+    )
+    return pd.Series(summary, index=report.index, dtype=object)
+
+
+# consequences that pass the impact filter, and the loss of function subset
+IMPACTS = [
+    "frameshift_variant",
+    "inframe_deletion",
+    "inframe_insertion",
+    "missense_variant",
+    "protein_altering_variant",
+    "splice_acceptor_variant",
+    "splice_donor_variant",
+    "start_lost",
+    "stop_gained",
+    "stop_lost",
+]
+LOF_IMPACTS = [
+    "frameshift_variant",
+    "splice_acceptor_variant",
+    "splice_donor_variant",
+    "start_lost",
+    "stop_gained",
+]
+
+
 def filter_cadd(cadd):
     if cadd == "None":
         return True
@@ -236,21 +411,9 @@ def filter_cadd(cadd):
 
 
 def filter_impact(impact, clinvar):
-    impacts = [
-        "frameshift_variant",
-        "inframe_deletion",
-        "inframe_insertion",
-        "missense_variant",
-        "protein_altering_variant",
-        "splice_acceptor_variant",
-        "splice_donor_variant",
-        "start_lost",
-        "stop_gained",
-        "stop_lost",
-    ]
     if clinvar.lower().find("pathogenic") != -1:
         return True
-    elif impact in impacts:
+    elif impact in IMPACTS:
         return True
     else:
         return False
@@ -273,14 +436,44 @@ def filter_pli(pli):
 
 
 def filter_lof(impact):
-    impacts = [
-        "frameshift_variant",
-        "splice_acceptor_variant",
-        "splice_donor_variant",
-        "start_lost",
-        "stop_gained",
-    ]
-    if impact in impacts:
+    if impact in LOF_IMPACTS:
         return True
     else:
         return False
+
+
+# Column-wise equivalents of the filters above. Each returns a boolean array
+# aligned to its input and gives the same result as applying the scalar filter
+# to every value; values the scalar filters would fail on (e.g. "." for CADD)
+# simply do not pass. cadd_mask and pli_mask take the report, so they can use
+# its normalized score columns.
+
+
+def _category_mask(column, values):
+    # membership is tested once per distinct value, then broadcast through the codes
+    codes = pd.Categorical(column)
+    member = np.append(codes.categories.isin(values), False)
+    return member[codes.codes]
+
+
+def cadd_mask(report):
+    sentinels = scores.sentinels(report, "Cadd_score")
+    return (sentinels == scores.NONE) | scores.compare(report, "Cadd_score", "ge", 15)
+
+
+def pli_mask(report):
+    return scores.compare(report, "Exac_pli_score", "ge", 0.95)
+
+
+def impact_mask(impact, clinvar):
+    pathogenic = (
+        pd.Series(clinvar)
+        .str.lower()
+        .str.contains("pathogenic", regex=False, na=False)
+        .to_numpy(dtype=bool)
+    )
+    return pathogenic | _category_mask(impact, IMPACTS)
+
+
+def lof_mask(impact):
+    return _category_mask(impact, LOF_IMPACTS)
@@ -0,0 +1,375 @@
+import gzip
+import re
+import numpy as np
+import pandas as pd
+from group_variants import variants, scores, reader
+
+# records parsed before they are turned into a DataFrame chunk
+CHUNK_RECORDS = 100000
+
+# report columns taken from the VEP CSQ or snpEff ANN INFO field, with the
+# sub-field names each tool uses
+CONSEQUENCE_FIELDS = {
+    "Gene": ["SYMBOL", "Gene_Name"],
+    "Variation": ["Consequence", "Annotation"],
+    "Refseq_change": ["HGVSc", "HGVS.c"],
+    "Clinvar": ["CLIN_SIG"],
+}
+
+# values of report columns that no annotation source fills, using the same
+# sentinels as C4R reports: "None" for missing scores, "." for missing text
+REPORT_DEFAULTS = {
+    "Gene": ".",
+    "Variation": ".",
+    "Refseq_change": ".",
+    "Clinvar": ".",
+    "omim_phenotype": ".",
+    "omim_inheritance": ".",
+    "Gnomad_af_popmax": 0.0,
+    "Gnomad_ac": 0,
+    "Gnomad_hom": 0,
+    "Gnomad_oe_lof_score": ".",
+    "Cadd_score": "None",
+    "Sift_score": "None",
+    "Polyphen_score": "None",
+    "Vest3_score": "None",
+    "Revel_score": "None",
+    "Exac_pli_score": ".",
+    "C4R_WES_counts": 0,
+}
+
+# columns compared as numbers by the filters; everything else stays text
+NUMERIC_COLUMNS = {
+    "Quality": "float64",
+    "Gnomad_af_popmax": "float64",
+    "Gnomad_ac": "Int32",
+    "Gnomad_hom": "Int32",
+    "C4R_WES_counts": "Int32",
+}
+
+# header names of the key columns of annotation sources, lower case
+CHROM_NAMES = ["#chrom", "chrom", "#chr", "chr", "chromosome", "#chromosome"]
+POS_NAMES = ["pos", "position", "start"]
+GENE_NAMES = ["gene", "symbol", "gene_name", "#gene"]
+
+
+def is_vcf(path):
+    return re.search(r"\.vcf(\.b?gz)?$", path) is not None
+
+
+def report_name(path):
+    # output file prefix, like the .csv stripped from C4R report names
+    return re.sub(r"\.vcf(\.b?gz)?$", "", path)
+
+
+def open_text(path):
+    # bgzip output is gzip compatible, so tabix-indexed files read like any .gz
+    if path.endswith(".gz") or path.endswith(".bgz"):
+        return gzip.open(path, "rt")
+    return open(path)
+
+
+def contig_key(chrom, contigs):
+    """
+    Sort key of a chromosome: its position among the VCF's ##contig lines, or
+    1-22, X, Y, M, then anything else alphabetically. A leading "chr" is ignored.
+    """
+    name = chrom[3:] if chrom.lower().startswith("chr") else chrom
+    if name in contigs:
+        return (0, contigs[name], "")
+    if name.isdigit():
+        return (1, int(name), "")
+    if name in ["X", "Y", "M", "MT"]:
+        return (1, 100 + ["X", "Y", "M", "MT"].index(name), "")
+    return (2, 0, name)
+
+
+def parse_source_spec(spec):
+    """
+    Parses an annotation source given as path or path:Column=Report_column,...
+    Without a mapping every non-key column is added under its own name.
+    """
+    path, _, mapping = spec.partition(":")
+    columns = {}
+    for pair in filter(None, mapping.split(",")):
+        column, _, report_column = pair.partition("=")
+        columns[column] = report_column or column
+    return path, columns
+
+
+def read_source_header(lines):
+    # skips ## comments; the header is the first remaining line
+    for line in lines:
+        if not line.startswith("##"):
+            return line.rstrip("\n").split("\t")
+    return []
+
+
+def _find(header, names):
+    lower = [column.lower() for column in header]
+    for name in names:
+        if name in lower:
+            return lower.index(name)
+    return None
+
+
+class PositionSource:
+    """
+    A TSV of per-variant annotations (e.g. CADD, gnomAD), sorted by chromosome
+    and position in the same order as the VCF. Read sequentially alongside the
+    VCF, so only the records at the current position are held in memory.
+    """
+
+    def __init__(self, path, header, lines, columns, contigs):
+        self.path = path
+        self.lines = lines
+        self.contigs = contigs
+        self.chrom = _find(header, CHROM_NAMES)
+        self.pos = _find(header, POS_NAMES)
+        self.ref = _find(header, ["ref", "reference"])
+        self.alt = _find(header, ["alt", "alternate"])
+        keys = [self.chrom, self.pos, self.ref, self.alt]
+        if not columns:
+            columns = {
+                column: column for i, column in enumerate(header) if i not in keys
+            }
+        self.columns = [(header.index(column), name) for column, name in columns.items()]
+        self.report_columns = list(columns.values())
+        self.block_key = None
+        self.block = []
+        self.pending = self._next()
+
+    def _next(self):
+        for line in self.lines:
+            fields = line.rstrip("\n").split("\t")
+            key = contig_key(fields[self.chrom], self.contigs) + (int(fields[self.pos]),)
+            return key, fields
+        return None
+
+    def lookup(self, key, ref, alt):
+        """
+        Returns the annotation values for a variant, or None if the source has
+        no record for it. Keys must be looked up in increasing order.
+        """
+        if key != self.block_key:
+            while self.pending is not None and self.pending[0] < key:
+                self.pending = self._next()
+            self.block_key = key
+            self.block = []
+            while self.pending is not None and self.pending[0] == key:
+                self.block.append(self.pending[1])
+                self.pending = self._next()
+        for fields in self.block:
+            if self.ref is not None and fields[self.ref] != ref:
+                continue
+            if self.alt is not None and fields[self.alt] != alt:
+                continue
+            return [fields[i] for i, _ in self.columns]
+        return None
+
+
+class GeneSource:
+    """
+    A TSV of per-gene annotations (e.g. OMIM, pLI). Gene tables are small, so
+    they are loaded whole and joined to each chunk by gene symbol.
+    """
+
+    def __init__(self, path, header, lines, columns):
+        self.path = path
+        gene = _find(header, GENE_NAMES)
+        if not columns:
+            columns = {column: column for i, column in enumerate(header) if i != gene}
+        self.report_columns = list(columns.values())
+        table = pd.read_csv(
+            lines, sep="\t", names=header, dtype=str, keep_default_na=False
+        )
+        table = table.drop_duplicates(header[gene]).set_index(header[gene])
+        self.table = table[list(columns)].rename(columns=columns)
+
+    def join(self, genes):
+        return self.table.reindex(genes.to_numpy()).set_index(genes.index)
+
+
+def open_source(spec, contigs):
+    path, columns = parse_source_spec(spec)
+    lines = open_text(path)
+    header = read_source_header(lines)
+    if _find(header, CHROM_NAMES) is not None and _find(header, POS_NAMES) is not None:
+        return PositionSource(path, header, lines, columns, contigs)
+    if _find(header, GENE_NAMES) is not None:
+        return GeneSource(path, header, lines, columns)
+    raise ValueError("%s has neither chrom/pos nor gene columns" % path)
+
+
+def read_header(lines):
+    """
+    Reads the meta-information and #CHROM lines of a VCF. Returns the contig
+    order, the CSQ/ANN INFO field and its sub-field names, and the sample names.
+    """
+    contigs = {}
+    consequence = None
+    for line in lines:
+        if line.startswith("##contig=<"):
+            name = re.search(r"ID=([^,>]+)", line).group(1)
+            name = name[3:] if name.lower().startswith("chr") else name
+            contigs.setdefault(name, len(contigs))
+        elif line.startswith("##INFO=<ID=CSQ,") or line.startswith("##INFO=<ID=ANN,"):
+            description = re.search(r'Description="([^"]*)"', line).group(1)
+            # VEP: "... Format: Allele|...", snpEff: "...: 'Allele | ...'"
+            fields = description.rsplit(":", 1)[-1].strip("' ")
+            consequence = (line[11:14], [field.strip() for field in fields.split("|")])
+        elif line.startswith("#CHROM"):
+            return contigs, consequence, line.rstrip("\n").split("\t")[9:]
+    raise ValueError("VCF has no #CHROM header line")
+
+
+def consequence_values(info, alt, consequence):
+    # report columns from the first CSQ/ANN entry for this allele
+    values = dict.fromkeys(CONSEQUENCE_FIELDS, ".")
+    if consequence is None:
+        return values
+    name, fields = consequence
+    entries = None
+    for item in info.split(";"):
+        if item.startswith(name + "="):
+            entries = item[len(name) + 1 :].split(",")
+            break
+    if not entries:
+        return values
+    entry = entries[0].split("|")
+    if "Allele" in fields:
+        allele = fields.index("Allele")
+        for candidate in entries:
+            candidate = candidate.split("|")
+            if candidate[allele] == alt:
+                entry = candidate
+                break
+    for column, names in CONSEQUENCE_FIELDS.items():
+        for field in names:
+            if field in fields and entry[fields.index(field)]:
+                # the most severe consequence comes first in VEP's & separated list
+                values[column] = entry[fields.index(field)].split("&")[0]
+                break
+    return values
+
+
+def zygosity(genotypes, allele):
+    """
+    Zygosity of each genotype (GT strings such as 0/1, 1|1 or ./.) for the given
+    allele index: Hom when every allele is that allele, including haploid calls,
+    Het when some are, and - otherwise.
+    """
+    alleles = genotypes.str.replace("|", "/", regex=False).str.split("/", expand=True)
+    matches = alleles.eq(allele, axis=0)
+    carries = matches.any(axis=1)
+    hom = (matches | alleles.isnull()).all(axis=1) & carries
+    return pd.Series(np.where(hom, "Hom", np.where(carries, "Het", "-")), index=genotypes.index)
+
+
+def _make_chunk(records, genotypes, samples, family_id, sources, source_values):
+    chunk = pd.DataFrame(
+        records, columns=["Position", "Ref", "Alt", "allele", "Quality"] + list(CONSEQUENCE_FIELDS)
+    )
+    alleles = chunk.pop("allele")
+    for i, sample in enumerate(samples):
+        chunk[variants.get_zygosity(variants.parse_id(family_id, sample))] = zygosity(
+            pd.Series(genotypes[i], dtype=object), alleles
+        )
+    for source, values in zip(sources, source_values):
+        if isinstance(source, GeneSource):
+            annotations = source.join(chunk["Gene"])
+        else:
+            annotations = pd.DataFrame(
+                [row if row is not None else [np.nan] * len(source.report_columns) for row in values],
+                columns=source.report_columns,
+            )
+        for column in source.report_columns:
+            chunk[column] = annotations[column].to_numpy()
+    return chunk
+
+
+def read_vcf(path, family_id, annotations=(), chunk_records=CHUNK_RECORDS):
+    """
+    Reads a (bgzipped) multi-sample VCF into a report with the columns the
+    group_variants filters use: Position, Ref, Alt, Gene, Zygosity.* and
+    Burden.* per sample, the consequence fields of a VEP CSQ or snpEff ANN INFO
+    field, and the columns of each annotation source. Multi-allelic records give
+    one row per allele.
+
+    annotations are TSV paths (optionally path:Column=Report_column,...), either
+    keyed by chrom/pos(/ref/alt) and sorted like the VCF, which are merged while
+    the VCF is read, or keyed by gene. Report columns left unfilled get the
+    sentinels in REPORT_DEFAULTS.
+
+    Records are parsed chunk_records at a time, but the whole report is returned
+    as one frame: Burden.* counts each sample's variants per gene over the whole
+    VCF, and the tabs (compound hets, sorting) read every variant anyway.
+    """
+    lines = open_text(path)
+    contigs, consequence, samples = read_header(lines)
+    sources = [open_source(spec, contigs) for spec in annotations]
+    position_sources = [s for s in sources if isinstance(s, PositionSource)]
+
+    chunks = []
+    records = []
+    genotypes = [[] for _ in samples]
+    source_values = [[] for _ in sources]
+    for line in lines:
+        fields = line.rstrip("\n").split("\t")
+        chrom, pos, _, ref, alts, quality, _, info = fields[:8]
+        key = contig_key(chrom, contigs) + (int(pos),)
+        # GT is always the first FORMAT field
+        calls = [call.partition(":")[0] for call in fields[9:]]
+        for allele, alt in enumerate(alts.split(","), 1):
+            if alt == "*":
+                continue
+            record = {
+                "Position": "%s:%s" % (chrom, pos),
+                "Ref": ref,
+                "Alt": alt,
+                "allele": str(allele),
+                "Quality": quality,
+            }
+            record.update(consequence_values(info, alt, consequence))
+            records.append(record)
+            for i, call in enumerate(calls):
+                genotypes[i].append(call)
+            for source, values in zip(sources, source_values):
+                if source in position_sources:
+                    values.append(source.lookup(key, ref, alt))
+        if len(records) >= chunk_records:
+            chunks.append(_make_chunk(records, genotypes, samples, family_id, sources, source_values))
+            records = []
+            genotypes = [[] for _ in samples]
+            source_values = [[] for _ in sources]
+    if records or not chunks:
+        chunks.append(_make_chunk(records, genotypes, samples, family_id, sources, source_values))
+    lines.close()
+    for source in position_sources:
+        source.lines.close()
+
+    # joined here, since burden below is a count over every chunk
+    report = pd.concat(chunks, ignore_index=True)
+    for column, value in REPORT_DEFAULTS.items():
+        if column not in report.columns:
+            report[column] = value
+        else:
+            report[column] = report[column].fillna(value)
+    for column, dtype in NUMERIC_COLUMNS.items():
+        report[column] = pd.to_numeric(report[column], errors="coerce").astype(dtype)
+
+    # burden: number of variants in the same gene carried by each sample. Variants
+    # without a gene are not one gene, so each only counts itself
+    genes = report["Gene"].where(~report["Gene"].isin([".", ""]))
+    for sample in samples:
+        sample_id = variants.parse_id(family_id, sample)
+        carried = report[variants.get_zygosity(sample_id)] != "-"
+        burden = carried.groupby(genes).transform("sum")
+        report[variants.get_burden(sample_id)] = burden.fillna(carried.astype(int)).astype("Int32")
+
+    # same leading column order as C4R reports
+    first = ["Position", "Ref", "Alt", "Gene"]
+    first += [c for c in report.columns if c.startswith("Zygosity.")]
+    first += [c for c in report.columns if c.startswith("Burden.")]
+    report = report[first + [c for c in report.columns if c not in first]]
+    return scores.normalize(reader.compact(report))
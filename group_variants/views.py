@@ -0,0 +1,45 @@
+import numpy as np
+
+
+class RowView:
+    """
+    Rows of a base frame by position, in tab order. Tabs of one report are views
+    of the same frame, and columns are only gathered when a view is written.
+    """
+
+    def __init__(self, frame, rows):
+        self.frame = frame
+        self.rows = np.asarray(rows, dtype=np.intp)
+
+    @property
+    def columns(self):
+        return self.frame.columns
+
+    @property
+    def empty(self):
+        return len(self.rows) == 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, column):
+        # one column of the view, so row filters and masks can read it like a frame
+        return self.frame[column].iloc[self.rows]
+
+    def subset(self, mask):
+        # the rows of the view where mask, aligned to the view, is true
+        return RowView(self.frame, self.rows[np.asarray(mask, dtype=bool)])
+
+    def take(self):
+        return self.frame.iloc[self.rows]
+
+
+def sort_rows(frame, rows, columns):
+    """
+    Returns rows in the order frame.iloc[rows].sort_values(columns) puts them,
+    copying only the sort columns.
+    """
+    keys = frame[columns].iloc[rows]
+    keys.index = rows
+    return keys.sort_values(columns).index.to_numpy()
+
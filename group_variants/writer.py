@@ -0,0 +1,181 @@
+import xlsxwriter
+from group_variants import scores, views
+
+# Excel's row limit, including the header row
+MAX_ROWS = 1048576
+MAX_SHEET_NAME = 31
+
+# cell formats used by the conditional formatting rules
+RULE_FORMATS = {
+    # light red fill with dark red text
+    "red": {"bg_color": "#FFC7CE", "font_color": "#9C0006"},
+    # green fill with dark green text
+    "green": {"bg_color": "#C6EFCE", "font_color": "#006100"},
+    # yellow fill with dark yellow text
+    "yellow": {"bg_color": "#fad97f", "font_color": "#d1a52c"},
+}
+
+# threshold highlighting for report columns. A rule applies to the first of its
+# columns present in the sheet, and is skipped if none are.
+CONDITIONAL_FORMATS = [
+    {"columns": ["Cadd_score"], "criteria": ">=", "value": 15, "format": "green"},
+    {
+        "columns": ["C4R_WES_counts", "Frequency_in_C4R"],
+        "criteria": ">",
+        "value": 10,
+        "format": "red",
+    },
+    {"columns": ["Gnomad_af_popmax"], "criteria": ">", "value": 0.005, "format": "red"},
+    {"columns": ["Gnomad_hom"], "criteria": ">", "value": 2, "format": "red"},
+    {
+        "columns": ["Gnomad_oe_lof_score"],
+        "criteria": "<",
+        "value": 0.35,
+        "format": "yellow",
+    },
+    {"columns": ["Exac_pli_score"], "criteria": ">", "value": 0.9, "format": "yellow"},
+    {"columns": ["Sift_score"], "criteria": "<", "value": 0.05, "format": "yellow"},
+    {"columns": ["Polyphen_score"], "criteria": ">", "value": 0.9, "format": "yellow"},
+    {"columns": ["Quality"], "criteria": "<", "value": 500, "format": "red"},
+]
+
+
+def open_workbook(path):
+    """
+    Opens an xlsxwriter workbook in constant memory mode: each row is flushed to
+    disk once the next one is started, so rows must be written in order.
+    """
+    return xlsxwriter.Workbook(
+        path,
+        {
+            "constant_memory": True,
+            "strings_to_numbers": False,
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+        },
+    )
+
+
+def column_values(column):
+    # python objects with None for missing values, which xlsxwriter leaves blank
+    return column.to_numpy(dtype=object, na_value=None)
+
+
+def view_values(view):
+    # the written values of a views.RowView, gathered one column at a time
+    values = []
+    for column in view.columns:
+        if scores.is_companion_column(column):
+            continue
+        if scores.is_normalized(view.frame, column):
+            part = view.frame[[column] + scores.companion_columns(column)].iloc[view.rows]
+            values.append(column_values(scores.display(part)[column]))
+        else:
+            values.append(column_values(view.frame[column].iloc[view.rows]))
+    return values
+
+
+class SheetWriter:
+    """
+    Writes DataFrames row by row to a worksheet, appending each frame below the
+    previous one. Rows past Excel's row limit continue on new sheets named
+    sheet_name_2, sheet_name_3, ... each with its own header row.
+    """
+
+    def __init__(self, workbook, sheet_name, columns):
+        self.workbook = workbook
+        self.sheet_name = sheet_name
+        # normalized score columns are written with their sentinels, not as extra columns
+        self.columns = [
+            str(column) for column in columns if not scores.is_companion_column(column)
+        ]
+        # same look as the pandas header row
+        self.header_format = workbook.add_format(
+            {"bold": True, "border": 1, "align": "center", "valign": "top"}
+        )
+        self.worksheets = []
+        # number of data rows written to each worksheet
+        self.rows = []
+        self.row = MAX_ROWS
+        self._add_worksheet()
+
+    def _add_worksheet(self):
+        sheet_name = self.sheet_name
+        if self.worksheets:
+            suffix = "_%d" % (len(self.worksheets) + 1)
+            sheet_name = sheet_name[: MAX_SHEET_NAME - len(suffix)] + suffix
+        worksheet = self.workbook.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, self.columns, self.header_format)
+        self.worksheets.append(worksheet)
+        self.rows.append(0)
+        self.row = 1
+
+    def append(self, frame):
+        # frame is a DataFrame or a views.RowView
+        if isinstance(frame, views.RowView):
+            values = view_values(frame)
+        else:
+            frame = scores.display(frame)
+            values = [column_values(frame.iloc[:, i]) for i in range(frame.shape[1])]
+        start = 0
+        while start < len(frame):
+            if self.row == MAX_ROWS:
+                self._add_worksheet()
+            end = min(len(frame), start + MAX_ROWS - self.row)
+            worksheet = self.worksheets[-1]
+            for row in zip(*[column[start:end] for column in values]):
+                worksheet.write_row(self.row, 0, row)
+                self.row += 1
+            self.rows[-1] = self.row - 1
+            start = end
+
+
+def write_frame(workbook, sheet_name, frame):
+    """
+    Writes a DataFrame or views.RowView with a header row and no index, like
+    DataFrame.to_excel. Returns the SheetWriter used.
+    """
+    sheet = SheetWriter(workbook, sheet_name, frame.columns)
+    sheet.append(frame)
+    return sheet
+
+
+def apply_conditional_formats(sheet, rules=CONDITIONAL_FORMATS):
+    """
+    Highlights cells of a written sheet according to rules. Rules only cover the
+    rows and columns holding data, not whole columns of the worksheet.
+    """
+    formats = {
+        name: sheet.workbook.add_format(properties)
+        for name, properties in RULE_FORMATS.items()
+    }
+    # a default format for blanks
+    blank_format = sheet.workbook.add_format()
+    last_column = len(sheet.columns) - 1
+    for worksheet, last_row in zip(sheet.worksheets, sheet.rows):
+        # this will prevent blanks in columns with conditional formatting for values
+        # less than a threshold from being highlighted
+        worksheet.conditional_format(
+            0,
+            0,
+            last_row,
+            last_column,
+            {"type": "blanks", "stop_if_true": True, "format": blank_format},
+        )
+        for rule in rules:
+            columns = [column for column in rule["columns"] if column in sheet.columns]
+            if not columns:
+                continue
+            column = sheet.columns.index(columns[0])
+            worksheet.conditional_format(
+                0,
+                column,
+                last_row,
+                column,
+                {
+                    "type": "cell",
+                    "criteria": rule["criteria"],
+                    "value": rule["value"],
+                    "format": formats[rule["format"]],
+                },
+            )
@@ -1,126 +1,454 @@
+import os
+import numpy as np
 import pandas as pd
 import argparse
-from group_variants import variants
+from group_variants import (
+    variants,
+    reader,
+    cache,
+    writer,
+    timing,
+    pedigree,
+    vcf,
+    incremental,
+    cohort,
+    views,
+    genes,
+    regions,
+    shards,
+)
 
+SUMMARY_PAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "summary_pages")
 
-def main(
-    report, proband_id, report_type, family_id, file, maternal_id, paternal_id, panel
-):
-    summaries = []
-
-    proband_id = variants.parse_id(args.family_id, proband_id)
-    print(proband_id)
-
-    if args.maternal_id and args.paternal_id:
-        maternal_id = variants.parse_id(args.family_id, args.maternal_id)
-        paternal_id = variants.parse_id(args.family_id, args.paternal_id)
-
-    # add summary for each variant describing pathogenicity predictions and gnomad frequency
-    for index, variant in report.iterrows():
-        summary = variants.summary_field(
-            variant["Cadd_score"],
-            variant["Sift_score"],
-            variant["Polyphen_score"],
-            variant["Vest3_score"],
-            variant["Revel_score"],
-            variant["Gnomad_ac"],
-            variant["Gnomad_hom"],
-            variant["Refseq_change"],
-            variant["Variation"],
-            variant["Gene"],
-            variant['C4R_WES_counts'],
-            variant['Quality'],
-            variant['Exac_pli_score']
-        )
-        summaries.append(summary)
-    report["Summary"] = summaries
+
+def load_summary_page(report_type):
+    # summary pages ship with the scripts in summary_pages/
+    return pd.read_csv(os.path.join(SUMMARY_PAGES, "%s.csv" % report_type))
+
+
+# counts are nullable integers, and a missing count passes no filter
+def c4r_count_filter(report):
+    try:
+        rare = report["Frequency_in_C4R"] < 100
+    except KeyError:
+        rare = report["C4R_WES_counts"] < 100
+    return rare.to_numpy(dtype=bool, na_value=False)
+
+
+def gnomad_hom_filter(report):
+    return (report["Gnomad_hom"] == 0).to_numpy(dtype=bool, na_value=False)
+
+
+def impact_filter(report):
+    return variants.impact_mask(report["Variation"], report["Clinvar"])
+
+
+# row filters applied to each report type before any derived column is computed,
+# cheapest first so the string matching of the impact filter only sees rare variants
+PREFILTERS = {
+    "trio": [c4r_count_filter, gnomad_hom_filter],
+    "singleton": [c4r_count_filter, gnomad_hom_filter, impact_filter],
+}
+
+
+def prefilter(report, report_type):
+    # each filter is evaluated only on the rows that passed the previous ones, and
+    # reads just its columns of them; the report is copied once, after the last filter
+    rows = np.arange(len(report))
+    for keep in PREFILTERS.get(report_type, []):
+        if len(rows):
+            rows = rows[np.asarray(keep(views.RowView(report, rows)))]
+    return report.iloc[rows]
+
+
+def insert_summary(report, summary):
+    # Summary as the first column
+    report = report.assign(Summary=summary)
     cols = list(report.columns)
     cols = [cols[-1]] + cols[:-1]
-    report = report[cols]
+    return report[cols]
 
 
-    # if it's a trio, apply gnomAD, C4R counts filters
-    if report_type == "trio":
-        try:
-            report = report[report["Frequency_in_C4R"] < 100]
-        except KeyError:
-            report = report[report["C4R_WES_counts"] < 100]
-        report = report[report["Gnomad_hom"] == 0]
-
-    # if it's a singleton, apply gnomAD, C4R counts, and impact filters to all variants
-    if report_type == "singleton":
-        try:
-            report = report[report["Frequency_in_C4R"] < 100]
-        except KeyError:
-            report = report[report["C4R_WES_counts"] < 100]
-        report = report[report["Gnomad_hom"] == 0]
-        report = report[
-            report.apply(
-                lambda x: variants.filter_impact(x.Variation, x.Clinvar), axis=1
+def prepare(report, report_type, timer, summarize=True):
+    """
+    Applies the gnomAD, C4R counts and (for singletons) impact filters shared by
+    every tab, then adds the Summary column for the remaining variants only.
+    """
+    with timer.stage("filter", len(report)) as stage:
+        report = prefilter(report, report_type)
+        stage.rows_out = len(report)
+    if not summarize:
+        return report
+
+    with timer.stage("summary", len(report)) as stage:
+        # add summary for each variant describing pathogenicity predictions and gnomad frequency
+        # (reports read through the cache already have one)
+        if "Summary" not in report.columns:
+            report = insert_summary(
+                report, variants.summary_fields(report, "C4R_WES_counts")
             )
-        ]
+        stage.rows_out = len(report)
+    return report
 
-    # get variants by inheritance pattern
+
+def add_recurrence(report, connection, family_id, timer):
+    # cohort recurrence columns from a cohort_index.py index, for the filtered variants only
+    if connection is None:
+        return report
+    with timer.stage("cohort", len(report)) as stage:
+        report = cohort.recurrence(connection, report, family_id)
+        stage.rows_out = len(report)
+    return report
+
+
+def add_gene_annotations(report, gene_index, timer):
+    # OMIM and panel columns from a gene_index.py index, for the filtered variants only
+    if gene_index is None:
+        return report
+    with timer.stage("genes", len(report)) as stage:
+        report = genes.annotate(report, gene_index)
+        stage.rows_out = len(report)
+    return report
+
+
+def make_tabs(
+    report, categories, proband_id, report_type, maternal_id, paternal_id, panel
+):
+    # tabs of a summarized and filtered report from its variants.classify categories,
+    # as views of the report so no tab holds a copy of its rows
     AR = variants.autosomal_recessive(
-        report, proband_id, maternal_id, paternal_id, report_type
+        report, proband_id, maternal_id, paternal_id, report_type, categories, view=True
     )
     comp_het = variants.compound_het(
-        report, proband_id, maternal_id, paternal_id, report_type
+        report, proband_id, maternal_id, paternal_id, report_type, categories, view=True
     )
     hemi = variants.hemizygous(
-        report, proband_id, maternal_id, paternal_id, report_type
+        report, proband_id, maternal_id, paternal_id, report_type, categories, view=True
     )
-    omim = variants.dominant_OMIM(report, proband_id)
+    omim = variants.dominant_OMIM(report, proband_id, categories, view=True)
     if report_type == "trio":
-        de_novo = variants.denovo(report, proband_id, maternal_id, paternal_id)
+        de_novo = variants.denovo(
+            report, proband_id, maternal_id, paternal_id, categories, view=True
+        )
     else:
-        dominant_nonOMIM = variants.dominant_nonOMIM(report, proband_id)
-        dominant_nonOMIM = dominant_nonOMIM[
-            dominant_nonOMIM["Exac_pli_score"].apply(variants.filter_pli)
-        ]
-        try:
-            dominant_nonOMIM = dominant_nonOMIM[
-                dominant_nonOMIM["Variation"].apply(variants.filter_lof)
-            ]
-        except KeyError:
+        dominant_nonOMIM = variants.dominant_nonOMIM(
+            report, proband_id, categories, view=True
+        )
+        dominant_nonOMIM = dominant_nonOMIM.subset(
+            variants.pli_mask(dominant_nonOMIM)
+            & variants.lof_mask(dominant_nonOMIM["Variation"])
+        )
+        if dominant_nonOMIM.empty:
             print("No LoF variants with plI >= 0.95")
     # if variants are annotated with a panel, add a tab containing all variants falling in panel
     if panel:
-        panel_variants = variants.panel(report, proband_id)
-        panel_variants = panel_variants[
-            panel_variants["Cadd_score"].apply(variants.filter_cadd)
-        ]
+        panel_variants = variants.panel(report, proband_id, categories, view=True)
+        panel_variants = panel_variants.subset(variants.cadd_mask(panel_variants))
 
-    # write report
-    with pd.ExcelWriter("%s_formatted.xlsx" % file) as writer:
-        workbook = writer.book
-        if report_type == "trio":
-            summary = pd.read_csv(
-                "/hpf/largeprojects/ccmbio/mcouse/tools/NGS_reports/summary_pages/trio.csv"
+    tabs = {"Summary": load_summary_page(report_type)}
+    if report_type == "trio":
+        tabs["De_novo"] = de_novo
+    else:
+        tabs["Dominant_nonOMIM"] = dominant_nonOMIM
+    tabs["Autosomal_recessive"] = AR
+    tabs["Compound_heterozygous"] = comp_het
+    tabs["Hemizygous"] = hemi
+    tabs["Dominant_OMIM"] = omim
+    if panel:
+        tabs["Panels"] = panel_variants
+    return tabs
+
+
+def tab_frames(tabs):
+    # DataFrame copies of the rows of views.RowView tabs, for callers of the library API
+    return {
+        name: tab.take() if isinstance(tab, views.RowView) else tab for name, tab in tabs.items()
+    }
+
+
+def prioritize(
+    report,
+    proband_id,
+    report_type,
+    family_id,
+    maternal_id=None,
+    paternal_id=None,
+    panel=False,
+    timer=None,
+    cohort_index=None,
+    gene_index=None,
+    processes=1,
+    view=False,
+):
+    """
+    Groups the variants of a report by inheritance pattern. Returns a dict of tab
+    name to DataFrame of the filtered report, in the order the tabs are written,
+    starting with the Summary page. With view=True, tabs are views.RowView of the
+    filtered report instead of copies, as write_report writes them. The input
+    report is not modified. With a cohort_index connection, cohort recurrence
+    columns are added to every tab, and with a gene_index from genes.load_index,
+    OMIM and panel columns are replaced by its own. With processes > 1,
+    summaries and categories are computed per chromosome on that many
+    processes, giving the same tabs.
+    """
+    if timer is None:
+        timer = timing.StageTimer()
+
+    proband_id = variants.parse_id(family_id, proband_id)
+
+    if maternal_id and paternal_id:
+        maternal_id = variants.parse_id(family_id, maternal_id)
+        paternal_id = variants.parse_id(family_id, paternal_id)
+
+    report = prepare(report, report_type, timer, summarize=processes <= 1)
+    report = add_gene_annotations(report, gene_index, timer)
+    report = add_recurrence(report, cohort_index, family_id, timer)
+
+    with timer.stage("classify", len(report)):
+        # classify every variant by inheritance pattern in one pass, then take each tab from it
+        if processes > 1:
+            # summaries are computed with the categories, in the same processes
+            categories, summary = shards.classify(
+                report,
+                proband_id,
+                maternal_id,
+                paternal_id,
+                report_type,
+                processes,
+                None if "Summary" in report.columns else "C4R_WES_counts",
             )
-            summary.to_excel(writer, sheet_name="Summary", index=False)
-            de_novo.to_excel(writer, sheet_name="De_novo", index=False)
+            if summary is not None:
+                report = insert_summary(report, summary)
         else:
-            summary = pd.read_csv(
-                "/hpf/largeprojects/ccmbio/mcouse/tools/NGS_reports/summary_pages/singleton.csv"
-            )
-            summary.to_excel(writer, sheet_name="Summary", index=False)
-            dominant_nonOMIM.to_excel(
-                writer, sheet_name="Dominant_nonOMIM", index=False
+            categories = variants.classify(
+                report, proband_id, maternal_id, paternal_id, report_type
             )
-        AR.to_excel(writer, sheet_name="Autosomal_recessive", index=False)
-        comp_het.to_excel(writer, sheet_name="Compound_heterozygous", index=False)
-        hemi.to_excel(writer, sheet_name="Hemizygous", index=False)
-        omim.to_excel(writer, sheet_name="Dominant_OMIM", index=False)
+
+    with timer.stage("tabs", len(report)) as stage:
+        tabs = make_tabs(
+            report, categories, proband_id, report_type, maternal_id, paternal_id, panel
+        )
+        stage.rows_out = sum(len(tab) for tab in tabs.values())
+    return tabs if view else tab_frames(tabs)
+
+
+def prioritize_incremental(
+    report,
+    proband_id,
+    report_type,
+    family_id,
+    file,
+    maternal_id=None,
+    paternal_id=None,
+    panel=False,
+    timer=None,
+    cohort_index=None,
+    gene_index=None,
+    view=False,
+):
+    """
+    Like prioritize, but reuses the summaries and categories stored by the
+    previous incremental run on the same output. Only variants whose content
+    changed get a new summary, and only genes with a changed or removed variant
+    are classified again. Returns the tabs, the names of the tabs that differ
+    from the previous run, and the state to save once they are written.
+    """
+    if timer is None:
+        timer = timing.StageTimer()
+
+    proband_id = variants.parse_id(family_id, proband_id)
+    if maternal_id and paternal_id:
+        maternal_id = variants.parse_id(family_id, maternal_id)
+        paternal_id = variants.parse_id(family_id, paternal_id)
+    options = {
+        "report_type": report_type,
+        "proband_id": proband_id,
+        "maternal_id": maternal_id,
+        "paternal_id": paternal_id,
+        "panel": bool(panel),
+    }
+    previous, previous_tabs = incremental.load_state(file, options)
+
+    with timer.stage("filter", len(report)) as stage:
+        report = prefilter(report, report_type)
+        stage.rows_out = len(report)
+    # annotations and recurrence change with their sources, so they are part of each
+    # variant's content
+    report = add_gene_annotations(report, gene_index, timer)
+    report = add_recurrence(report, cohort_index, family_id, timer)
+
+    with timer.stage("hash", len(report)) as stage:
+        keys = incremental.row_keys(report)
+        hashes = incremental.row_hashes(report)
+        positions, stale = incremental.match_rows(previous, keys, hashes)
+        changed = np.flatnonzero(positions < 0)
+        reused = positions >= 0
+        stage.rows_out = len(changed)
+
+    with timer.stage("summary", len(changed)):
+        if "Summary" not in report.columns:
+            summary = np.empty(len(report), dtype=object)
+            if previous is not None:
+                summary[reused] = previous["summary"].to_numpy()[positions[reused]]
+            summary[changed] = variants.summary_fields(
+                report.iloc[changed], "C4R_WES_counts"
+            ).to_numpy()
+            report = insert_summary(report, pd.Series(summary, index=report.index, dtype=object))
+
+    with timer.stage("classify") as stage:
+        # compound het depends on the other variants of a gene, so every variant in a
+        # gene with a changed or removed variant is classified again
+        changed_genes = report["Gene"].iloc[changed].astype(object)
+        categories = np.zeros(len(report), dtype=np.uint8)
+        if previous is not None:
+            changed_genes = pd.concat([changed_genes, previous["gene"].iloc[stale]])
+            categories[reused] = previous["category"].to_numpy()[positions[reused]]
+        reclassify = np.flatnonzero(~reused | report["Gene"].isin(changed_genes).to_numpy())
+        categories[reclassify] = variants.classify(
+            report.iloc[reclassify], proband_id, maternal_id, paternal_id, report_type
+        ).to_numpy()
+        categories = pd.Series(categories, index=report.index)
+        stage.rows_in = len(reclassify)
+
+    with timer.stage("tabs", len(report)) as stage:
+        tabs = make_tabs(
+            report, categories, proband_id, report_type, maternal_id, paternal_id, panel
+        )
+        report_hashes = incremental.frame_hashes(report)
+        tab_hashes = {
+            name: incremental.tab_hash(tab, report_hashes) for name, tab in tabs.items()
+        }
+        changed_tabs = [
+            name for name in tabs if tab_hashes[name] != previous_tabs.get(name)
+        ]
+        # a tab that is no longer written also changes the workbook
+        changed_tabs += [name for name in previous_tabs if name not in tabs]
+        stage.rows_out = sum(len(tab) for tab in tabs.values())
+
+    rows = pd.DataFrame(
+        {
+            "key": keys,
+            "content": hashes,
+            "gene": report["Gene"].astype(object),
+            "category": categories.to_numpy(),
+            "summary": report["Summary"].astype(object),
+        }
+    )
+    return tabs if view else tab_frames(tabs), changed_tabs, (options, rows, tab_hashes)
+
+
+def prioritize_pedigree(
+    report, family, panel=False, timer=None, cohort_index=None, gene_index=None, view=False
+):
+    """
+    Groups the variants of a report by how they segregate in a pedigree read
+    with pedigree.read_ped. Reports are filtered like trios. Returns a dict of
+    tab name to DataFrame, or views.RowView with view=True, starting with the
+    Summary page.
+    """
+    if timer is None:
+        timer = timing.StageTimer()
+
+    report = prepare(report, "trio", timer)
+    report = add_gene_annotations(report, gene_index, timer)
+    report = add_recurrence(report, cohort_index, family.family_id, timer)
+
+    with timer.stage("classify", len(report)):
+        categories = pedigree.segregate(report, family)
+
+    with timer.stage("tabs", len(report)) as stage:
+        tabs = {"Summary": load_summary_page("trio")}
+        tabs.update(pedigree.pedigree_tabs(report, family, categories, view=True))
+        # panel variants are those carried by the first affected sample
         if panel:
-            panel_variants.to_excel(writer, sheet_name="Panels", index=False)
+            proband_id = family.column_id(family.affected_samples()[0])
+            panel_variants = variants.panel(report, proband_id, view=True)
+            tabs["Panels"] = panel_variants.subset(variants.cadd_mask(panel_variants))
+        stage.rows_out = sum(len(tab) for tab in tabs.values())
+    return tabs if view else tab_frames(tabs)
+
+
+def write_report(tabs, file, timer=None):
+    if timer is None:
+        timer = timing.StageTimer()
+    with timer.stage("write", sum(len(tab) for tab in tabs.values())):
+        with writer.open_workbook("%s_formatted.xlsx" % file) as workbook:
+            for sheet_name, tab in tabs.items():
+                writer.write_frame(workbook, sheet_name, tab)
+
+
+def main(
+    report,
+    proband_id,
+    report_type,
+    family_id,
+    file,
+    maternal_id,
+    paternal_id,
+    panel,
+    timer=None,
+    family=None,
+    incremental_run=False,
+    cohort_index=None,
+    gene_index=None,
+    processes=1,
+):
+    # with a pedigree, tabs follow segregation across every sample in it
+    if family is not None:
+        print(", ".join(family.column_id(sample) for sample in family.affected_samples()))
+        tabs = prioritize_pedigree(
+            report, family, panel, timer, cohort_index, gene_index, view=True
+        )
+    elif incremental_run:
+        print(variants.parse_id(family_id, proband_id))
+        tabs, changed_tabs, state = prioritize_incremental(
+            report,
+            proband_id,
+            report_type,
+            family_id,
+            file,
+            maternal_id,
+            paternal_id,
+            panel,
+            timer,
+            cohort_index,
+            gene_index,
+            view=True,
+        )
+        # the workbook is only rewritten when one of its tabs changed
+        if not changed_tabs and os.path.exists("%s_formatted.xlsx" % file):
+            print("No tabs changed since the last run")
+            return
+        print("Changed tabs: %s" % ", ".join(changed_tabs))
+        write_report(tabs, file, timer)
+        incremental.save_state(file, *state)
+        return
+    else:
+        print(variants.parse_id(family_id, proband_id))
+        tabs = prioritize(
+            report,
+            proband_id,
+            report_type,
+            family_id,
+            maternal_id,
+            paternal_id,
+            panel,
+            timer,
+            cohort_index,
+            gene_index,
+            processes,
+            view=True,
+        )
+    write_report(tabs, file, timer)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Generates excel report from wes csv with variants grouped by inheritance pattern"
     )
-    parser.add_argument("-report", type=str, help="input report csv")
+    parser.add_argument(
+        "-report", type=str, help="input report csv, or a multi-sample vcf(.gz)"
+    )
     parser.add_argument("-report_type", type=str, help="singleton or trio")
     parser.add_argument("-family_id", type=str, help="family id")
     parser.add_argument("-proband_id", type=str, help="proband sample id")
@@ -136,13 +464,98 @@ if __name__ == "__main__":
         help="True if annotated with gene panel (e.g. immunopanel), default False",
         default=False,
     )
+    parser.add_argument(
+        "-cache_dir",
+        type=str,
+        help="directory to cache parsed reports in, shared by all scripts",
+        default=None,
+    )
+    parser.add_argument(
+        "-ped",
+        type=str,
+        help="PED file of the family; groups variants by segregation across all its samples "
+        "instead of proband/maternal/paternal ids",
+        default=None,
+    )
+    parser.add_argument(
+        "-annotation",
+        type=str,
+        action="append",
+        help="for vcf input, a sorted chrom/pos or gene keyed TSV of annotations to join, "
+        "optionally path:Column=Report_column,...; may be repeated",
+        default=[],
+    )
+    parser.add_argument(
+        "-incremental",
+        action="store_true",
+        help="reuse summaries and categories from the last -incremental run on this report, "
+        "recomputing only changed variants, and skip writing if no tab changed",
+    )
+    parser.add_argument(
+        "-cohort_index",
+        type=str,
+        help="cohort index built by cohort_index.py; adds the number of other families carrying "
+        "variants in each gene and each variant",
+        default=None,
+    )
+    parser.add_argument(
+        "-gene_index",
+        type=str,
+        help="gene panel and OMIM index compiled by gene_index.py; replaces the report's "
+        "omim_phenotype, omim_inheritance and Panels columns",
+        default=None,
+    )
+    parser.add_argument(
+        "-gene_panels",
+        type=str,
+        help="comma separated panels of -gene_index to fill Panels from, default all",
+        default=None,
+    )
+    parser.add_argument(
+        "-genes",
+        type=str,
+        help="comma separated genes to prioritize instead of the whole report; read from the "
+        "indexed blocks of a report indexed by report_index.py",
+        default=None,
+    )
+    parser.add_argument(
+        "-regions",
+        type=str,
+        help="comma separated regions (chrom, chrom:pos or chrom:start-end) to prioritize, "
+        "as -genes",
+        default=None,
+    )
+    parser.add_argument(
+        "-processes",
+        type=int,
+        help="summarize and classify singleton and trio reports per chromosome on this many "
+        "processes, default 1",
+        default=1,
+    )
+    parser.add_argument(
+        "-timings",
+        action="store_true",
+        help="write per-stage time, memory and row counts to a .timings.json file next "
+        "to the output",
+    )
     args = parser.parse_args()
+    selected_genes = args.genes.split(",") if args.genes else None
+    selected_regions = args.regions.split(",") if args.regions else None
 
-    file = args.report.strip(".csv")
-    try:
-        report = pd.read_csv(args.report, encoding="latin1")
-    except:
-        report = pd.read_csv(args.report, encoding="latin1", sep="\t")
+    timer = timing.StageTimer(args.timings)
+    with timer.stage("read") as stage:
+        if vcf.is_vcf(args.report):
+            file = vcf.report_name(args.report)
+            report = vcf.read_vcf(args.report, args.family_id, args.annotation)
+            report = regions.select_variants(report, selected_genes, selected_regions)
+        elif regions.is_indexed(args.report):
+            file = reader.report_name(regions.report_name(args.report))
+            report = regions.read_report(args.report, selected_genes, selected_regions)
+        else:
+            file = reader.report_name(args.report)
+            report = cache.read_report(args.report, args.cache_dir, summary=False)
+            report = regions.select_variants(report, selected_genes, selected_regions)
+        stage.rows_out = len(report)
 
     main(
         report,
@@ -153,4 +566,17 @@ if __name__ == "__main__":
         args.maternal_id,
         args.paternal_id,
         args.panel,
+        timer,
+        pedigree.read_ped(args.ped, args.family_id) if args.ped else None,
+        args.incremental,
+        cohort.connect(args.cohort_index) if args.cohort_index else None,
+        (
+            genes.load_index(
+                args.gene_index, args.gene_panels.split(",") if args.gene_panels else None
+            )
+            if args.gene_index
+            else None
+        ),
+        args.processes,
     )
+    timer.write("%s_formatted.timings.json" % file)
@@ -0,0 +1,67 @@
+import argparse
+import time
+from group_variants import regions, scores
+
+
+def main(report, output, block_rows, genes, region_list, query_output):
+    if genes is None and region_list is None:
+        start = time.perf_counter()
+        index = regions.index_report(report, output, block_rows)
+        print(
+            "%d variants in %d blocks, %d genes, written to %s in %.1fs"
+            % (
+                sum(block[2] for block in index["blocks"]),
+                len(index["blocks"]),
+                len(index["genes"]),
+                output or report + ".gz",
+                time.perf_counter() - start,
+            )
+        )
+        return
+
+    start = time.perf_counter()
+    variants = regions.read_report(report, genes, region_list)
+    print("%d variants read in %.1f ms" % (len(variants), (time.perf_counter() - start) * 1000))
+    if query_output:
+        # the report's own columns, with scores as written
+        scores.display(variants, as_text=True).to_csv(query_output, index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Writes a report sorted by position as compressed blocks with a gene and region index, or reads the variants of some genes or regions from one"
+    )
+    parser.add_argument(
+        "-report", type=str, help="report csv/tsv to index, or an indexed report (.gz) to query"
+    )
+    parser.add_argument(
+        "-output", type=str, help="indexed report to write, default the report name + .gz", default=None
+    )
+    parser.add_argument(
+        "-block_rows",
+        type=int,
+        help="variants per compressed block, default %d" % regions.BLOCK_ROWS,
+        default=regions.BLOCK_ROWS,
+    )
+    parser.add_argument(
+        "-genes", type=str, help="comma separated genes to read from an indexed report", default=None
+    )
+    parser.add_argument(
+        "-regions",
+        type=str,
+        help="comma separated regions (chrom, chrom:pos or chrom:start-end) to read from an indexed report",
+        default=None,
+    )
+    parser.add_argument(
+        "-query_output", type=str, help="csv to write the variants read by -genes/-regions to", default=None
+    )
+    args = parser.parse_args()
+
+    main(
+        args.report,
+        args.output,
+        args.block_rows,
+        args.genes.split(",") if args.genes else None,
+        args.regions.split(",") if args.regions else None,
+        args.query_output,
+    )
@@ -0,0 +1,250 @@
+import argparse
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from group_variants import variants, reader, cache, timing, pedigree, vcf, cohort, genes, regions
+import add_summary
+import format_report
+import filter_for_genome_rounds
+import prioritize_variants
+
+# outputs the pipeline can write, named like batch_reports.py -script
+OUTPUTS = ["summary", "format", "genome_rounds", "prioritize"]
+
+# outputs that summarize every variant; prioritize only summarizes its filtered ones
+ALL_VARIANT_SUMMARIES = ["summary", "genome_rounds"]
+
+
+def output_files(report, outputs):
+    # output names follow each script, so a pipeline run writes the same files
+    files = {
+        "summary": reader.report_name(report),
+        "format": report.replace(".csv", ""),
+        "genome_rounds": report.replace(".tsv", ""),
+        "prioritize": reader.report_name(report),
+    }
+    if vcf.is_vcf(report):
+        files = {output: vcf.report_name(report) for output in files}
+    return {output: files[output] for output in outputs}
+
+
+def run_output(output, report, file, options, timings):
+    """
+    Writes one output from the shared report, with its own timer since timers
+    are not shared between threads. Returns (output, seconds, error).
+    """
+    start = time.perf_counter()
+    timer = timing.StageTimer(timings)
+    try:
+        if output == "summary":
+            add_summary.main(report, file, timer)
+            timer.write("%s_with_summaries.timings.json" % file)
+        elif output == "format":
+            format_report.main(report.drop(columns="Summary", errors="ignore"), file, timer)
+            timer.write("%s.timings.json" % file)
+        elif output == "genome_rounds":
+            filter_for_genome_rounds.main(report, file, timer)
+            timer.write("%s_for_exome_rounds.timings.json" % file)
+        else:
+            # sqlite connections belong to the thread that opened them
+            prioritize_variants.main(
+                report,
+                options["proband_id"],
+                options["report_type"],
+                options["family_id"],
+                file,
+                options["maternal_id"],
+                options["paternal_id"],
+                options["panel"],
+                timer,
+                options["family"],
+                cohort_index=(
+                    cohort.connect(options["cohort_index"]) if options["cohort_index"] else None
+                ),
+                processes=options["processes"],
+            )
+            timer.write("%s_formatted.timings.json" % file)
+        error = ""
+    except Exception:
+        error = traceback.format_exc().strip().splitlines()[-1]
+    return output, round(time.perf_counter() - start, 2), error
+
+
+def main(report, files, options, threads, timer=None, timings=False, gene_index=None):
+    """
+    Writes every output in files (output name to file prefix) from one parsed
+    report. The Summary column is computed once and shared by the outputs that
+    use it, as are OMIM and panel columns from a gene_index; outputs are then
+    written concurrently, each workbook by its own thread.
+    """
+    if timer is None:
+        timer = timing.StageTimer()
+
+    if gene_index is not None:
+        with timer.stage("genes", len(report)) as stage:
+            report = genes.annotate(report, gene_index)
+            stage.rows_out = len(report)
+
+    if any(output in files for output in ALL_VARIANT_SUMMARIES):
+        with timer.stage("summary", len(report)) as stage:
+            if "Summary" not in report.columns:
+                report.insert(0, "Summary", variants.summary_fields(report))
+            stage.rows_out = len(report)
+
+    with timer.stage("outputs", len(report)):
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = {
+                executor.submit(run_output, output, report, file, options, timings): output
+                for output, file in files.items()
+            }
+            results = []
+            for future, output in futures.items():
+                # run_output catches errors of its own; this keeps the other
+                # outputs' results if one still escapes it, e.g. a SystemExit
+                try:
+                    results.append(future.result())
+                except (Exception, SystemExit) as e:
+                    error = traceback.format_exception_only(e)[-1].strip()
+                    results.append((output, float("nan"), error))
+    for output, seconds, error in results:
+        print("%s: %s in %ss %s" % (output, "failed" if error else "ok", seconds, error))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Loads a report once and writes any of the add_summary, format_report, filter_for_genome_rounds and prioritize_variants outputs from it"
+    )
+    parser.add_argument(
+        "-report", type=str, help="input report csv/tsv, or a multi-sample vcf(.gz)"
+    )
+    parser.add_argument(
+        "-outputs",
+        type=str,
+        nargs="+",
+        choices=OUTPUTS,
+        help="outputs to write, default all but prioritize",
+        default=["summary", "format", "genome_rounds"],
+    )
+    parser.add_argument(
+        "-threads",
+        type=int,
+        help="number of outputs to write at once, default one per output",
+        default=None,
+    )
+    parser.add_argument("-report_type", type=str, help="prioritize: singleton or trio")
+    parser.add_argument("-family_id", type=str, help="family id")
+    parser.add_argument("-proband_id", type=str, help="prioritize: proband sample id")
+    parser.add_argument(
+        "-maternal_id", type=str, help="prioritize: maternal sample id", default=None
+    )
+    parser.add_argument(
+        "-paternal_id", type=str, help="prioritize: paternal sample id", default=None
+    )
+    parser.add_argument(
+        "-panel",
+        type=bool,
+        help="prioritize: True if annotated with gene panel (e.g. immunopanel), default False",
+        default=False,
+    )
+    parser.add_argument(
+        "-ped",
+        type=str,
+        help="prioritize: PED file of the family, as in prioritize_variants.py",
+        default=None,
+    )
+    parser.add_argument(
+        "-cohort_index",
+        type=str,
+        help="prioritize: cohort index built by cohort_index.py",
+        default=None,
+    )
+    parser.add_argument(
+        "-processes",
+        type=int,
+        help="prioritize: summarize and classify per chromosome on this many processes, default 1",
+        default=1,
+    )
+    parser.add_argument(
+        "-gene_index",
+        type=str,
+        help="gene panel and OMIM index compiled by gene_index.py, annotating every output",
+        default=None,
+    )
+    parser.add_argument(
+        "-gene_panels",
+        type=str,
+        help="comma separated panels of -gene_index to fill Panels from, default all",
+        default=None,
+    )
+    parser.add_argument(
+        "-annotation",
+        type=str,
+        action="append",
+        help="for vcf input, annotations to join as in prioritize_variants.py; may be repeated",
+        default=[],
+    )
+    parser.add_argument(
+        "-cache_dir",
+        type=str,
+        help="directory to cache parsed reports in, shared by all scripts",
+        default=None,
+    )
+    parser.add_argument(
+        "-genes",
+        type=str,
+        help="comma separated genes to write outputs for instead of the whole report; read from the indexed blocks of a report indexed by report_index.py",
+        default=None,
+    )
+    parser.add_argument(
+        "-regions",
+        type=str,
+        help="comma separated regions (chrom, chrom:pos or chrom:start-end) to write outputs for, as -genes",
+        default=None,
+    )
+    parser.add_argument(
+        "-timings",
+        action="store_true",
+        help="write per-stage time, memory and row counts to a .timings.json file next to each output",
+    )
+    args = parser.parse_args()
+
+    selected_genes = args.genes.split(",") if args.genes else None
+    selected_regions = args.regions.split(",") if args.regions else None
+    indexed = not vcf.is_vcf(args.report) and regions.is_indexed(args.report)
+    files = output_files(regions.report_name(args.report) if indexed else args.report, args.outputs)
+    timer = timing.StageTimer(args.timings)
+    with timer.stage("read") as stage:
+        if vcf.is_vcf(args.report):
+            report = vcf.read_vcf(args.report, args.family_id, args.annotation)
+            report = regions.select_variants(report, selected_genes, selected_regions)
+        elif indexed:
+            report = regions.read_report(args.report, selected_genes, selected_regions)
+        else:
+            # a Summary cached by an earlier run is reused
+            report = cache.read_report(
+                args.report,
+                args.cache_dir,
+                summary=any(output in files for output in ALL_VARIANT_SUMMARIES),
+            )
+            report = regions.select_variants(report, selected_genes, selected_regions)
+        stage.rows_out = len(report)
+
+    options = {
+        "proband_id": args.proband_id,
+        "report_type": args.report_type,
+        "family_id": args.family_id,
+        "maternal_id": args.maternal_id,
+        "paternal_id": args.paternal_id,
+        "panel": args.panel,
+        "family": pedigree.read_ped(args.ped, args.family_id) if args.ped else None,
+        "cohort_index": args.cohort_index,
+        "processes": args.processes,
+    }
+    gene_index = None
+    if args.gene_index:
+        gene_index = genes.load_index(
+            args.gene_index, args.gene_panels.split(",") if args.gene_panels else None
+        )
+    main(report, files, options, args.threads or len(files), timer, args.timings, gene_index)
+    timer.write("%s_pipeline.timings.json" % list(files.values())[0])
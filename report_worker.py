@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import time
+import traceback
+import uuid
+from group_variants import reader, cache
+import prioritize_variants
+import format_report
+
+# a queue directory holds one json file per job in each of these states
+QUEUE_STATES = ["incoming", "running", "done", "failed"]
+
+
+def make_queue(queue_dir):
+    for state in QUEUE_STATES:
+        os.makedirs(os.path.join(queue_dir, state), exist_ok=True)
+
+
+def submit_job(queue_dir, job):
+    """
+    Adds a job to the queue and returns its id. A job is a dict with "script"
+    ("prioritize" or "format"), "report", and for prioritize the same options as
+    prioritize_variants.py: report_type, family_id, proband_id, maternal_id,
+    paternal_id and panel. "cache_dir" is optional for both.
+    """
+    make_queue(queue_dir)
+    job_id = "%d_%s" % (time.time() * 1000, uuid.uuid4().hex[:8])
+    job = dict(job, job_id=job_id, submitted=time.time())
+    # write under a temporary name so the worker never picks up a partial job
+    tmp = os.path.join(queue_dir, "incoming", ".%s.tmp" % job_id)
+    with open(tmp, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp, os.path.join(queue_dir, "incoming", "%s.json" % job_id))
+    return job_id
+
+
+def queued_jobs(queue_dir):
+    incoming = os.path.join(queue_dir, "incoming")
+    return sorted(name for name in os.listdir(incoming) if name.endswith(".json"))
+
+
+def run_job(job):
+    if job["script"] == "prioritize":
+        # output names follow prioritize_variants.py and format_report.py
+        file = reader.report_name(job["report"])
+        report = cache.read_report(job["report"], job.get("cache_dir"), summary=False)
+        prioritize_variants.main(
+            report,
+            job["proband_id"],
+            job["report_type"],
+            job["family_id"],
+            file,
+            job.get("maternal_id"),
+            job.get("paternal_id"),
+            job.get("panel", False),
+        )
+    elif job["script"] == "format":
+        file = job["report"].replace(".csv", "")
+        report = cache.read_report(job["report"], job.get("cache_dir"), summary=None)
+        format_report.main(report, file)
+    else:
+        raise ValueError("unknown script %s" % job["script"])
+
+
+def claim_next(queue_dir):
+    # jobs are claimed by moving them to running/, so several workers can share a queue
+    for name in queued_jobs(queue_dir):
+        running = os.path.join(queue_dir, "running", name)
+        try:
+            os.rename(os.path.join(queue_dir, "incoming", name), running)
+        except FileNotFoundError:
+            continue
+        with open(running) as f:
+            return running, json.load(f)
+    return None, None
+
+
+def process_next(queue_dir):
+    """
+    Runs the oldest queued job, if any, and returns its result, recording the
+    time it spent queued and running.
+    """
+    running, job = claim_next(queue_dir)
+    if job is None:
+        return None
+    start = time.time()
+    try:
+        run_job(job)
+        job["status"] = "done"
+    except Exception:
+        job["status"] = "failed"
+        job["error"] = traceback.format_exc()
+    job["queued_seconds"] = round(start - job["submitted"], 3)
+    job["run_seconds"] = round(time.time() - start, 3)
+    with open(os.path.join(queue_dir, job["status"], os.path.basename(running)), "w") as f:
+        json.dump(job, f, indent=2)
+    os.remove(running)
+    return job
+
+
+def write_status(queue_dir, status):
+    tmp = os.path.join(queue_dir, ".status.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(status, f, indent=2)
+    os.replace(tmp, os.path.join(queue_dir, "status.json"))
+
+
+def main(queue_dir, poll, once):
+    make_queue(queue_dir)
+    status = {"pid": os.getpid(), "started": time.time(), "done": 0, "failed": 0}
+    while True:
+        job = process_next(queue_dir)
+        status["queue_depth"] = len(queued_jobs(queue_dir))
+        if job is not None:
+            status[job["status"]] += 1
+            status["last_job"] = {
+                key: job[key]
+                for key in ["job_id", "script", "report", "status", "queued_seconds", "run_seconds"]
+            }
+            print(
+                "%s %s: %s in %.2fs after %.2fs queued, %d jobs waiting"
+                % (
+                    job["job_id"],
+                    job["report"],
+                    job["status"],
+                    job["run_seconds"],
+                    job["queued_seconds"],
+                    status["queue_depth"],
+                ),
+                flush=True,
+            )
+        write_status(queue_dir, status)
+        if job is None:
+            if once:
+                break
+            time.sleep(poll)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Long-running worker that keeps pandas and the report scripts imported and runs report jobs from a queue directory"
+    )
+    parser.add_argument("-queue", type=str, help="queue directory")
+    parser.add_argument(
+        "-submit",
+        type=str,
+        help="json file describing a job to add to the queue, instead of running the worker",
+        default=None,
+    )
+    parser.add_argument(
+        "-poll", type=float, help="seconds between checks of an empty queue", default=1.0
+    )
+    parser.add_argument(
+        "-once",
+        action="store_true",
+        help="exit once the queue is empty instead of waiting for more jobs",
+    )
+    args = parser.parse_args()
+
+    if args.submit:
+        with open(args.submit) as f:
+            print(submit_job(args.queue, json.load(f)))
+    else:
+        main(args.queue, args.poll, args.once)
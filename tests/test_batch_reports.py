@@ -0,0 +1,56 @@
+import os
+import pandas as pd
+import batch_reports
+import report_pipeline
+
+
+def crash_family(family, script, cache_dir):
+    # a worker killed mid-report, as the kernel does when it runs out of memory
+    if family["family_id"] == "F2":
+        os._exit(1)
+    return batch_reports.run_family(family, script, cache_dir)
+
+
+def write_manifest(tmp_path, family_ids):
+    manifest = pd.DataFrame(
+        [
+            {
+                "report": str(tmp_path / ("%s.csv" % family_id)),
+                "family_id": family_id,
+                "proband_id": "P",
+                "maternal_id": "",
+                "paternal_id": "",
+                "report_type": "singleton",
+                "panel": "",
+            }
+            for family_id in family_ids
+        ]
+    )
+    manifest.to_csv(tmp_path / "manifest.csv", index=False)
+    return str(tmp_path / "manifest.csv")
+
+
+def test_a_dead_worker_fails_families_not_the_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_reports, "run_family", crash_family)
+    manifest = write_manifest(tmp_path, ["F1", "F2", "F3"])
+    summary = str(tmp_path / "summary.csv")
+    results = batch_reports.main(manifest, "prioritize", 1, None, summary)
+    assert sorted(results["family_id"]) == ["F1", "F2", "F3"]
+    assert results.set_index("family_id").loc["F2", "status"] == "failed"
+    assert "BrokenProcessPool" in results.set_index("family_id").loc["F2", "error"]
+    assert os.path.exists(summary)
+
+
+def exit_output(output, report, file, options, timings):
+    if output == "format":
+        raise SystemExit(1)
+    return output, 0.0, ""
+
+
+def test_an_escaping_output_error_keeps_the_other_results(monkeypatch):
+    monkeypatch.setattr(report_pipeline, "run_output", exit_output)
+    results = report_pipeline.main(
+        pd.DataFrame({"Gene": ["GENE1"]}), {"format": "f", "prioritize": "p"}, {}, 2
+    )
+    assert results[0][0] == "format" and results[0][2] == "SystemExit: 1"
+    assert results[1] == ("prioritize", 0.0, "")
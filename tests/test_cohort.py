@@ -0,0 +1,60 @@
+import numpy as np
+from benchmarks import synthetic_report
+from group_variants import cohort, reader
+
+FAMILIES = ["F1", "F2", "F3", "F4"]
+
+
+def write_cohort(tmp_path):
+    # trio reports over few genes, sharing some of the first family's sites
+    rng = np.random.default_rng(0)
+    paths = []
+    for family_id in FAMILIES:
+        report = synthetic_report.make_chunk(rng, 300, "trio", n_genes=40)
+        if paths:
+            first = reader.read_report(paths[0])
+            report.loc[:99, ["Position", "Ref", "Alt"]] = first.loc[:99, ["Position", "Ref", "Alt"]]
+        path = str(tmp_path / ("%s.wes.csv" % family_id))
+        report.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def brute_force_carriers(paths):
+    # (family, gene, position, ref, alt) of every qualifying variant any sample carries
+    carriers = set()
+    for path in paths:
+        report = reader.read_report(path)
+        zygosities = report[[c for c in report.columns if c.startswith("Zygosity.")]]
+        carried = zygosities.isin(["Het", "Hom"]).any(axis=1).to_numpy()
+        for _, row in report[cohort.qualifying(report) & carried].iterrows():
+            family_id = cohort.family_from_path(path)
+            carriers.add((family_id, row["Gene"], row["Position"], row["Ref"], row["Alt"]))
+    return carriers
+
+
+def test_recurrence_matches_a_brute_force_count(tmp_path):
+    paths = write_cohort(tmp_path)
+    connection = cohort.connect(str(tmp_path / "cohort.sqlite"))
+    assert cohort.update_index(connection, paths) == (len(FAMILIES), 0, 0)
+
+    report = reader.read_report(paths[0])
+    counted = cohort.recurrence(connection, report, "F1")
+    carriers = brute_force_carriers(paths)
+    gene_families = [
+        len({family for family, gene, *_ in carriers if gene == row["Gene"] and family != "F1"})
+        for _, row in report.iterrows()
+    ]
+    variant_families = [
+        len(
+            {
+                family
+                for family, _, *site in carriers
+                if site == [row["Position"], row["Ref"], row["Alt"]] and family != "F1"
+            }
+        )
+        for _, row in report.iterrows()
+    ]
+    assert counted[cohort.GENE_FAMILIES].tolist() == gene_families
+    assert counted[cohort.VARIANT_FAMILIES].tolist() == variant_families
+    assert max(variant_families) > 0
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+from group_variants import genes, variants
+
+GENEMAP = """\
+# Copyright (c) OMIM
+# MIM Number\tGene Symbols\tApproved Gene Symbol\tEntrez Gene ID\tEnsembl Gene ID\tPhenotypes
+100001\tGENE1\tGENE1\t1001\tENSG01\tSyndrome A, 200001 (3), Autosomal dominant
+100002\tGENE2\tGENE2\t1002\tENSG02\tSyndrome B, 200002 (3), Autosomal recessive; \
+Syndrome C, 200003 (3), X-linked recessive, ?Autosomal recessive
+100003\tGENE3\tGENE3\t1003\tENSG03\t
+100004\tGENE4, OLD4\tGENE4\t1004\tENSG04\tSyndrome D, 200004 (3)
+"""
+
+PANELS = {
+    "immunopanel.txt": "GENE1\nGENE5\n",
+    "cardio.tsv": "gene\tsource\nGENE1\tlab\nOLD4\tlab\n",
+}
+
+# genes of a report with the OMIM and panel columns upstream annotation gives them
+UPSTREAM = pd.DataFrame(
+    [
+        ("GENE1", "Syndrome A, 200001 (3)", "AD", "immunopanel,cardio"),
+        ("GENE2", "Syndrome B, 200002 (3); Syndrome C, 200003 (3)", "AR,XLR", None),
+        ("GENE3", ".", ".", None),
+        # listed under its alias
+        ("OLD4", "Syndrome D, 200004 (3)", ".", "cardio"),
+        # only on a panel
+        ("GENE5", ".", ".", "immunopanel"),
+        ("GENE6", ".", ".", None),
+        (".", ".", ".", None),
+        ("GENE1", "Syndrome A, 200001 (3)", "AD", "immunopanel,cardio"),
+    ],
+    columns=["Gene", "omim_phenotype", "omim_inheritance", "Panels"],
+)
+
+
+def compile_index(tmp_path):
+    genemap = tmp_path / "genemap2.txt"
+    genemap.write_text(GENEMAP)
+    paths = []
+    for name, text in PANELS.items():
+        (tmp_path / name).write_text(text)
+        paths.append(str(tmp_path / name))
+    return genes.compile_index(paths, str(genemap))
+
+
+def test_annotate_matches_upstream_columns(tmp_path):
+    index = compile_index(tmp_path)
+    # columns annotate replaces
+    report = UPSTREAM[["Gene"]].assign(omim_phenotype="?", omim_inheritance="?", Panels="?")
+    annotated = genes.annotate(report, index)
+    for column in ["omim_phenotype", "omim_inheritance", "Panels"]:
+        assert annotated[column].astype(object).tolist() == UPSTREAM[column].tolist()
+
+
+def test_annotated_columns_give_the_same_tabs(tmp_path):
+    index = compile_index(tmp_path)
+    n = len(UPSTREAM)
+    report = UPSTREAM.assign(
+        Position=["1:%d" % i for i in range(n)],
+        **{"Zygosity.F1_P": ["Het", "Hom"] * (n // 2), "Burden.F1_P": np.ones(n, dtype=int)},
+    )
+    annotated = genes.annotate(report, index)
+    pd.testing.assert_series_equal(
+        variants.classify(annotated, "F1_P", None, None, "singleton"),
+        variants.classify(report, "F1_P", None, None, "singleton"),
+    )
@@ -0,0 +1,147 @@
+import pandas as pd
+from group_variants import pedigree, variants
+
+# a quad: unaffected parents and an affected son and daughter
+QUAD = """\
+#family sample father mother sex phenotype
+FAM1 D 0 0 1 1
+FAM1 M 0 0 2 1
+FAM1 A D M 1 2
+FAM1 B D M 2 2
+"""
+
+# affected sibs and an unaffected brother, without their parents
+SIBS = """\
+FAM1 A 0 0 1 2
+FAM1 B 0 0 2 2
+FAM1 U 0 0 1 1
+"""
+
+
+def read_ped(tmp_path, text):
+    path = tmp_path / "family.ped"
+    path.write_text(text)
+    return pedigree.read_ped(str(path))
+
+
+def report(family, rows):
+    # (position, gene, zygosity of each sample in PED order) per variant
+    columns = [variants.get_zygosity(family.column_id(s)) for s in family.samples]
+    return pd.DataFrame(rows, columns=["Position", "Gene"] + columns)
+
+
+def segregating(family, rows, category):
+    variants_df = report(family, rows)
+    categories = pedigree.segregate(variants_df, family)
+    return variants_df["Position"][(categories & category) > 0].tolist()
+
+
+def test_read_ped(tmp_path):
+    family = read_ped(tmp_path, QUAD)
+    assert family.samples == ["D", "M", "A", "B"]
+    assert family.affected_samples() == ["A", "B"]
+    assert family.trios(family.affected_samples()) == [("A", "M", "D"), ("B", "M", "D")]
+
+
+def test_autosomal_recessive(tmp_path):
+    rows = [
+        # D, M, A, B
+        ("1:100", "GENE1", "Het", "Het", "Hom", "Hom"),
+        # an unaffected parent is hom
+        ("1:200", "GENE1", "Hom", "Het", "Hom", "Hom"),
+        # a parent does not carry it
+        ("1:300", "GENE1", "-", "Het", "Hom", "Hom"),
+        # one affected sib is only het
+        ("1:400", "GENE1", "Het", "Het", "Hom", "Het"),
+        # hom on X is X-linked instead
+        ("X:100", "GENE2", "-", "Het", "Hom", "Hom"),
+    ]
+    family = read_ped(tmp_path, QUAD)
+    assert segregating(family, rows, pedigree.AUTOSOMAL_RECESSIVE) == ["1:100"]
+
+
+def test_x_linked(tmp_path):
+    rows = [
+        ("X:100", "GENE1", "-", "Het", "Hom", "Hom"),
+        # the unaffected father carries it
+        ("X:200", "GENE1", "Het", "Het", "Hom", "Hom"),
+        # the unaffected mother is hom
+        ("X:300", "GENE1", "-", "Hom", "Hom", "Hom"),
+        ("1:100", "GENE2", "-", "Het", "Hom", "Hom"),
+    ]
+    family = read_ped(tmp_path, QUAD)
+    assert segregating(family, rows, pedigree.X_LINKED) == ["X:100"]
+
+
+def test_de_novo(tmp_path):
+    rows = [
+        ("1:100", "GENE1", "-", "-", "Het", "Het"),
+        ("1:200", "GENE1", "-", "-", "Het", "Hom"),
+        # inherited from the mother
+        ("1:300", "GENE1", "-", "Het", "Het", "Het"),
+        # only one affected sib has it
+        ("1:400", "GENE1", "-", "-", "Het", "-"),
+    ]
+    family = read_ped(tmp_path, QUAD)
+    assert segregating(family, rows, pedigree.DE_NOVO) == ["1:100", "1:200"]
+
+
+def test_compound_het(tmp_path):
+    rows = [
+        # a maternal and a paternal het in both sibs
+        ("1:100", "GENE1", "-", "Het", "Het", "Het"),
+        ("1:200", "GENE1", "Het", "-", "Het", "Het"),
+        # a maternal het and a de novo het
+        ("2:100", "GENE2", "-", "Het", "Het", "Het"),
+        ("2:200", "GENE2", "-", "-", "Het", "Het"),
+        # two maternal hets
+        ("3:100", "GENE3", "-", "Het", "Het", "Het"),
+        ("3:200", "GENE3", "-", "Het", "Het", "Het"),
+        # the maternal het is missing from one sib
+        ("4:100", "GENE4", "-", "Het", "Het", "-"),
+        ("4:200", "GENE4", "Het", "-", "Het", "Het"),
+        # both parents het
+        ("5:100", "GENE5", "Het", "Het", "Het", "Het"),
+        ("5:200", "GENE5", "Het", "-", "Het", "Het"),
+    ]
+    family = read_ped(tmp_path, QUAD)
+    assert segregating(family, rows, pedigree.COMPOUND_HET) == [
+        "1:100",
+        "1:200",
+        "2:100",
+        "2:200",
+    ]
+
+
+def test_shared_by_affected(tmp_path):
+    rows = [
+        ("1:100", "GENE1", "-", "-", "Het", "Hom"),
+        # carried by a parent
+        ("1:200", "GENE1", "Het", "-", "Het", "Het"),
+        # not carried by every affected sib
+        ("1:300", "GENE1", "-", "-", "-", "Het"),
+        ("X:100", "GENE2", "-", "-", "Hom", "Het"),
+    ]
+    family = read_ped(tmp_path, QUAD)
+    assert segregating(family, rows, pedigree.SHARED_BY_AFFECTED) == ["1:100", "X:100"]
+
+
+def test_without_genotyped_parents(tmp_path):
+    rows = [
+        # A, B, U
+        ("1:100", "GENE1", "Hom", "Hom", "Het"),
+        ("1:200", "GENE1", "Hom", "Hom", "Hom"),
+        ("2:100", "GENE2", "Het", "Het", "-"),
+        ("2:200", "GENE2", "Het", "Het", "Het"),
+        ("3:100", "GENE3", "Het", "Het", "-"),
+        ("X:100", "GENE4", "Hom", "Hom", "-"),
+        ("X:200", "GENE4", "Hom", "Hom", "Het"),
+    ]
+    family = read_ped(tmp_path, SIBS)
+    assert family.trios(family.affected_samples()) == []
+    assert segregating(family, rows, pedigree.AUTOSOMAL_RECESSIVE) == ["1:100"]
+    assert segregating(family, rows, pedigree.X_LINKED) == ["X:100"]
+    # two or more hets in a gene, with no parents to phase them
+    assert segregating(family, rows, pedigree.COMPOUND_HET) == ["2:100", "2:200"]
+    assert segregating(family, rows, pedigree.DE_NOVO) == []
+    assert segregating(family, rows, pedigree.SHARED_BY_AFFECTED) == ["2:100", "3:100", "X:100"]
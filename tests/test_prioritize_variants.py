@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+from benchmarks import synthetic_report
+from group_variants import cache, incremental, reader, timing, variants
+import prioritize_variants
+
+
+def write_report(path, n_rows, report_type):
+    synthetic_report.make_report(str(path), n_rows, report_type, seed=1)
+    return str(path)
+
+
+def test_only_prefiltered_variants_are_summarized(tmp_path, monkeypatch):
+    path = write_report(tmp_path / "report.csv", 2000, "singleton")
+    report = cache.read_report(path, str(tmp_path / "cache"), summary=False)
+    assert "Summary" not in report.columns
+
+    summarized = []
+    summary_fields = variants.summary_fields
+
+    def recording_summary_fields(report, *args):
+        summarized.append(len(report))
+        return summary_fields(report, *args)
+
+    monkeypatch.setattr(variants, "summary_fields", recording_summary_fields)
+    kept = len(prioritize_variants.prefilter(report, "singleton"))
+    tabs = prioritize_variants.prioritize(
+        report,
+        synthetic_report.PROBAND_ID,
+        "singleton",
+        synthetic_report.FAMILY_ID,
+        timer=timing.StageTimer(),
+    )
+    assert 0 < kept < len(report)
+    assert summarized == [kept]
+    assert all(np.all(tab["Summary"].notna()) for name, tab in tabs.items() if name != "Summary")
+
+
+def test_prioritize_returns_dataframes(tmp_path):
+    report = reader.read_report(write_report(tmp_path / "report.csv", 2000, "singleton"))
+    options = [synthetic_report.PROBAND_ID, "singleton", synthetic_report.FAMILY_ID]
+    tabs = prioritize_variants.prioritize(report, *options, panel=True)
+    assert all(isinstance(tab, pd.DataFrame) for tab in tabs.values())
+    views = prioritize_variants.prioritize(report, *options, panel=True, view=True)
+    assert list(views) == list(tabs)
+    for name, tab in tabs.items():
+        if name != "Summary":
+            pd.testing.assert_frame_equal(views[name].take(), tab)
+
+
+def trio_tabs(report, maternal_id, paternal_id):
+    tabs = prioritize_variants.prioritize(
+        report,
+        synthetic_report.PROBAND_ID,
+        "trio",
+        synthetic_report.FAMILY_ID,
+        maternal_id,
+        paternal_id,
+        timer=timing.StageTimer(),
+    )
+    return {name: tab for name, tab in tabs.items() if name != "Summary"}
+
+
+def test_de_novo_does_not_depend_on_which_parent_is_which(tmp_path):
+    report = reader.read_report(write_report(tmp_path / "trio.csv", 5000, "trio"))
+    mother = variants.parse_id(synthetic_report.FAMILY_ID, synthetic_report.MATERNAL_ID)
+    father = variants.parse_id(synthetic_report.FAMILY_ID, synthetic_report.PATERNAL_ID)
+    parents = {
+        variants.get_zygosity(mother): variants.get_zygosity(father),
+        variants.get_zygosity(father): variants.get_zygosity(mother),
+        variants.get_burden(mother): variants.get_burden(father),
+        variants.get_burden(father): variants.get_burden(mother),
+    }
+    swapped = report.rename(columns=parents)
+    de_novo = trio_tabs(report, synthetic_report.MATERNAL_ID, synthetic_report.PATERNAL_ID)["De_novo"]
+    swapped_de_novo = trio_tabs(
+        swapped, synthetic_report.MATERNAL_ID, synthetic_report.PATERNAL_ID
+    )["De_novo"]
+    assert len(de_novo) > 0
+    # the same variants in the same order, with each parent's columns back in place
+    swapped_de_novo = swapped_de_novo.rename(columns=parents)
+    pd.testing.assert_frame_equal(swapped_de_novo[de_novo.columns], de_novo)
+
+
+def test_processes_give_the_same_tabs(tmp_path):
+    for report_type in ["singleton", "trio"]:
+        path = write_report(tmp_path / ("%s.csv" % report_type), 5000, report_type)
+        report = cache.read_report(path, str(tmp_path / "cache"), summary=False)
+        assert "Summary" not in report.columns
+        tabs = {}
+        for processes in [1, 2]:
+            tabs[processes] = prioritize_variants.prioritize(
+                report,
+                synthetic_report.PROBAND_ID,
+                report_type,
+                synthetic_report.FAMILY_ID,
+                synthetic_report.MATERNAL_ID if report_type == "trio" else None,
+                synthetic_report.PATERNAL_ID if report_type == "trio" else None,
+                panel=True,
+                timer=timing.StageTimer(),
+                processes=processes,
+            )
+        assert list(tabs[1]) == list(tabs[2])
+        for name in tabs[1]:
+            if name == "Summary":
+                continue
+            assert "Summary" in tabs[1][name].columns
+            pd.testing.assert_frame_equal(tabs[2][name], tabs[1][name])
+
+
+def test_incremental_rerun_after_an_annotation_change_matches_a_full_run(tmp_path):
+    path = write_report(tmp_path / "trio.csv", 5000, "trio")
+    options = [
+        synthetic_report.PROBAND_ID,
+        "trio",
+        synthetic_report.FAMILY_ID,
+        str(tmp_path / "trio"),
+        synthetic_report.MATERNAL_ID,
+        synthetic_report.PATERNAL_ID,
+        True,
+    ]
+    tabs, changed_tabs, state = prioritize_variants.prioritize_incremental(
+        reader.read_report(path), *options
+    )
+    incremental.save_state(options[3], *state)
+
+    # refreshed annotations: new CADD scores and OMIM phenotypes, and a few variants
+    # dropped from the report
+    refreshed = pd.read_csv(path, dtype=str, keep_default_na=False)
+    refreshed.loc[:300, "Cadd_score"] = "31.5"
+    refreshed.loc[refreshed["Gene"].isin(["GENE1", "GENE2", "GENE3"]), "omim_phenotype"] = "New syndrome, 654321 (3)"
+    refreshed = refreshed.drop(index=range(1000, 1050))
+    refreshed.to_csv(path, index=False)
+    report = reader.read_report(path)
+
+    timer = timing.StageTimer(True)
+    tabs, changed_tabs, state = prioritize_variants.prioritize_incremental(
+        report, *options, timer
+    )
+    assert changed_tabs
+    # only the changed variants were summarized again
+    assert 0 < timer.stages["summary"].rows_in < len(report) / 2
+    full_tabs = prioritize_variants.prioritize(
+        report, *options[:3], *options[4:], timer=timing.StageTimer()
+    )
+    assert list(tabs) == list(full_tabs)
+    for name in tabs:
+        pd.testing.assert_frame_equal(tabs[name], full_tabs[name])
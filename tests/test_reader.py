@@ -0,0 +1,57 @@
+import numpy as np
+from group_variants import reader, variants
+import prioritize_variants
+
+# counts with and without missing values, split so one chunk of two rows has none
+REPORT = """\
+Position,Gene,Variation,Refseq_change,Clinvar,Cadd_score,Sift_score,Polyphen_score,Vest3_score,Revel_score,Exac_pli_score,Gnomad_ac,Gnomad_hom,C4R_WES_counts,Quality
+1:100,GENE1,missense_variant,NM_1:c.1A>G,.,20,0.01,0.9,0.6,0.7,0.99,12,0,3,55.5
+1:200,GENE1,missense_variant,NM_1:c.2A>G,.,20,0.01,0.9,0.6,0.7,0.99,5,0,7,60
+1:300,GENE2,stop_gained,NM_2:c.3A>G,.,None,.,None,.,None,.,,,,80
+1:400,GENE2,stop_gained,NM_2:c.4A>G,.,25,0.2,0.1,0.1,0.1,0.5,1,0,150,90
+"""
+
+
+def read(tmp_path, chunksize=None):
+    path = tmp_path / "report.csv"
+    path.write_text(REPORT)
+    return reader.read_report(str(path), chunksize)
+
+
+def test_counts_are_nullable_integers(tmp_path):
+    report = read(tmp_path)
+    for column in ["Gnomad_ac", "Gnomad_hom", "C4R_WES_counts"]:
+        assert report[column].dtype == "Int32"
+        assert report[column].isna().tolist() == [False, False, True, False]
+
+
+def test_summary_shows_counts_without_decimals(tmp_path):
+    # a float count column, as a column with missing values used to be read,
+    # would show "12.0 alleles and 0.0 homozygote(s)"
+    summaries = variants.summary_fields(read(tmp_path)).tolist()
+    assert "12 alleles and 0 homozygote(s) in gnomAD. Seen 3 time(s)" in summaries[0]
+    assert "nan alleles and nan homozygote(s) in gnomAD. Seen nan time(s)" in summaries[2]
+
+
+def test_chunks_show_counts_like_the_whole_report(tmp_path):
+    summaries = [
+        summary
+        for chunk in read(tmp_path, chunksize=2)
+        for summary in variants.summary_fields(chunk)
+    ]
+    assert summaries == variants.summary_fields(read(tmp_path)).tolist()
+
+
+def test_missing_counts_do_not_pass_the_prefilter(tmp_path):
+    report = read(tmp_path)
+    kept = prioritize_variants.prefilter(report, "trio")
+    assert kept["Position"].tolist() == ["1:100", "1:200"]
+    assert np.array_equal(
+        prioritize_variants.c4r_count_filter(report), [True, True, False, False]
+    )
+
+
+def test_report_name_removes_only_the_csv_suffix():
+    assert reader.report_name("1234.wes.csv") == "1234.wes"
+    assert reader.report_name("reports/s1.csv") == "reports/s1"
+    assert reader.report_name("s1.tsv") == "s1.tsv"
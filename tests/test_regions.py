@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from benchmarks import synthetic_report
+from group_variants import reader, regions
+import report_index
+
+REGIONS = ["1:50,000,000-120,000,000", "chrX", "2:1-90000000"]
+
+
+def write_report(tmp_path):
+    path = synthetic_report.make_report(str(tmp_path / "report.csv"), 3000, "trio", seed=3)
+    regions.index_report(path, block_rows=100)
+    return path
+
+
+def in_regions(report, region_list):
+    # brute force: parse every Position and check it against every region
+    keep = []
+    for position in report["Position"]:
+        chrom, pos = position.split(":")
+        keep.append(
+            any(
+                chrom == region_chrom and start <= int(pos) <= end
+                for region_chrom, start, end in map(regions.parse_region, region_list)
+            )
+        )
+    return report[np.array(keep)]
+
+
+def same_rows(frame, expected):
+    # categories depend on which rows were read, so compare categoricals by value
+    def rows(frame):
+        frame = frame.apply(
+            lambda c: c.astype("str") if isinstance(c.dtype, pd.CategoricalDtype) else c
+        )
+        return frame.sort_values(list(frame.columns), kind="stable").reset_index(drop=True)
+
+    assert len(frame) > 0
+    pd.testing.assert_frame_equal(rows(frame), rows(expected))
+
+
+def test_region_query_reads_exactly_the_rows_in_range(tmp_path):
+    path = write_report(tmp_path)
+    report = reader.read_report(path)
+    for region in REGIONS:
+        same_rows(regions.read_report(path + ".gz", regions=[region]), in_regions(report, [region]))
+    same_rows(regions.read_report(path + ".gz", regions=REGIONS), in_regions(report, REGIONS))
+    # a single position
+    position = report["Position"][0]
+    same_rows(
+        regions.read_report(path + ".gz", regions=[position]),
+        report[report["Position"] == position],
+    )
+
+
+def test_gene_query_reads_exactly_the_gene_rows(tmp_path):
+    path = write_report(tmp_path)
+    report = reader.read_report(path)
+    genes = report["Gene"][:3].tolist()
+    same_rows(regions.read_report(path + ".gz", genes=genes), report[report["Gene"].isin(genes)])
+
+
+def test_query_output_has_the_report_rows_as_written(tmp_path):
+    path = write_report(tmp_path)
+    query_output = str(tmp_path / "query.csv")
+    report_index.main(path + ".gz", None, None, None, REGIONS, query_output)
+    written = pd.read_csv(query_output, dtype=str, keep_default_na=False)
+    report = pd.read_csv(path, dtype=str, keep_default_na=False)
+    assert list(written.columns) == list(report.columns)
+    same_rows(written, in_regions(report, REGIONS))
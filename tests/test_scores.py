@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+from group_variants import scores, variants
+
+WRITTEN = ["30.0", "1", "0.999999998", "0.00001", "12345678.9", "None", ".", None, "0.9499999999", "0.95", "15", "14.99999999"]
+
+
+def normalized(values):
+    column = pd.Series(values, dtype="str")
+    return scores.normalize(pd.DataFrame({"Cadd_score": column, "Exac_pli_score": column}))
+
+
+def test_scores_are_float32_with_exact_text_only_where_needed():
+    report = normalized(WRITTEN)
+    assert report["Cadd_score"].dtype == np.float32
+    assert report["Cadd_score.sentinel"].dtype == np.int8
+    exact = report["Cadd_score.exact"]
+    assert exact.cat.codes.dtype == np.int8
+    assert sorted(exact.dropna()) == sorted(["30.0", "0.999999998", "0.00001", "12345678.9", "0.9499999999", "14.99999999"])
+
+
+def test_text_is_the_score_as_written():
+    report = normalized(WRITTEN)
+    expected = ["nan" if value is None else value for value in WRITTEN]
+    assert scores.text(report, "Cadd_score").tolist() == expected
+    assert scores.display(report, as_text=True)["Cadd_score"].tolist()[:5] == WRITTEN[:5]
+    assert list(scores.display(report).columns) == ["Cadd_score", "Exac_pli_score"]
+
+
+def test_thresholds_compare_like_float():
+    report = normalized(WRITTEN)
+    numbers = [np.nan if value in ["None", ".", None] else float(value) for value in WRITTEN]
+    with np.errstate(invalid="ignore"):
+        assert scores.compare(report, "Cadd_score", "ge", 15).tolist() == [n >= 15 for n in numbers]
+        assert variants.pli_mask(report).tolist() == [n >= 0.95 for n in numbers]
+        assert scores.compare(report, "Exac_pli_score", "lt", 0.95).tolist() == [n < 0.95 for n in numbers]
+
+
+def test_thresholds_are_shown_as_written_by_float32():
+    # compare relies on every threshold reading back from its float32 text
+    thresholds = [threshold for _, _, threshold in variants.SUMMARY_TOOLS] + [0.95]
+    for threshold in thresholds:
+        assert float(scores.number_text(np.array([threshold], dtype=np.float32))[0]) == threshold
+
+
+def test_replace_sentinels_drops_exact_text_of_non_numbers():
+    report = normalized(["1.0", "None", "abc", None])
+    assert scores.text(report, "Cadd_score").tolist() == ["1.0", "None", "abc", "nan"]
+    report = scores.replace_sentinels(report, "Cadd_score", scores.DOT)
+    assert scores.text(report, "Cadd_score").tolist() == ["1.0", ".", ".", "."]
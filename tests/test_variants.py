@@ -0,0 +1,284 @@
+import numpy as np
+import pandas as pd
+from benchmarks import synthetic_report
+from group_variants import reader, scores, variants
+
+REPORT = """\
+Position,Gene,Variation,Refseq_change,Cadd_score,Sift_score,Polyphen_score,Vest3_score,Revel_score,Exac_pli_score,Gnomad_ac,Gnomad_hom,C4R_WES_counts,Quality
+1:100,GENE1,missense_variant,NM_1:c.1A>G,30.0,0.01,0.9,0.6,0.7,0.99,12,0,3,55.5
+1:200,GENE1,stop_gained,NM_1:c.2A>G,None,.,None,.,None,.,,,,
+1:300,GENE2,synonymous_variant,,15,0.05,0.446,0.5,0.5,0.9499999999,0,1,0,12.5
+1:400,GENE2,intron_variant,NM_2:c.3A>G,,,,,,,7,,100,NaN
+2:500,GENE3,frameshift_variant,NM_3:c.4A>G,14.99999999,0.00001,0.999999998,.,0.5000001,1.0,,2,,3000.49
+2:600,,missense_variant,NM_3:c.5A>G,12345678.9,None,0.2,0.1,.,None,250,0,,0.5
+X:700,GENE4,splice_donor_variant,NM_4:c.6A>G,.,0.2,.,None,0.3,,3,0,41,1e3
+"""
+
+SUMMARY_ARGUMENTS = [
+    "Cadd_score",
+    "Sift_score",
+    "Polyphen_score",
+    "Vest3_score",
+    "Revel_score",
+    "Gnomad_ac",
+    "Gnomad_hom",
+    "Refseq_change",
+    "Variation",
+    "Gene",
+    "C4R_WES_counts",
+    "Quality",
+    "Exac_pli_score",
+]
+
+
+def write_report(tmp_path, text=REPORT):
+    path = tmp_path / "report.csv"
+    path.write_text(text)
+    return str(path)
+
+
+def summary_field_rows(path):
+    # summary_field on every row, with scores as written and missing values as NaN
+    report = pd.read_csv(
+        path,
+        encoding="latin1",
+        dtype=reader.REPORT_DTYPES,
+        keep_default_na=False,
+        na_values=reader.NA_VALUES,
+    )
+    rows = report[SUMMARY_ARGUMENTS].to_numpy(dtype=object, na_value=np.nan)
+    return [variants.summary_field(*row) for row in rows]
+
+
+def test_summary_fields_matches_summary_field(tmp_path):
+    path = write_report(tmp_path)
+    assert variants.summary_fields(reader.read_report(path)).tolist() == summary_field_rows(path)
+
+
+def test_summary_fields_matches_summary_field_in_chunks(tmp_path):
+    path = write_report(tmp_path)
+    summaries = [
+        summary
+        for chunk in reader.read_report(path, chunksize=3)
+        for summary in variants.summary_fields(chunk)
+    ]
+    assert summaries == summary_field_rows(path)
+
+
+def test_summary_fields_keeps_score_text(tmp_path):
+    summaries = variants.summary_fields(reader.read_report(write_report(tmp_path)))
+    assert summaries[0].startswith("CADD = 30.0; 5/5 tools")
+    assert summaries[0].endswith("Gene plI: 0.99")
+    assert summaries[4].startswith("CADD = 14.99999999; 3/4 tools")
+    assert summaries[5].startswith("CADD = 12345678.9;")
+
+
+def test_filter_masks_match_scalar_filters(tmp_path):
+    report = reader.read_report(write_report(tmp_path))
+    cadd = scores.text(report, "Cadd_score")
+    pli = scores.text(report, "Exac_pli_score")
+    expected_cadd = [value != "." and variants.filter_cadd(value) for value in cadd]
+    expected_pli = [value not in ["None"] and variants.filter_pli(value) for value in pli]
+    assert variants.cadd_mask(report).tolist() == expected_cadd
+    assert variants.pli_mask(report).tolist() == expected_pli
+
+
+def test_summary_fields_matches_summary_field_on_numeric_columns():
+    # reports built in memory, e.g. from a VCF, can hold float scores and
+    # nullable integer counts rather than text
+    report = pd.DataFrame(
+        {
+            "Cadd_score": [15.0, np.nan, 1e-05, 30.0],
+            "Sift_score": ["0.01", "None", ".", np.nan],
+            "Polyphen_score": [0.9, 0.446, np.nan, 0.5],
+            "Vest3_score": ["None", "0.51", "0.5", None],
+            "Revel_score": [0.6, 0.6, 0.4, 0.4],
+            "Exac_pli_score": [".", "0.95", None, "1"],
+            "Gnomad_ac": pd.array([12, None, 0, 3], dtype="Int64"),
+            "Gnomad_hom": pd.array([0, 1, None, 0], dtype="Int32"),
+            "Refseq_change": ["NM_1:c.1A>G", None, "", "NM_2:c.2A>G"],
+            "Variation": pd.Categorical(["missense_variant", "stop_gained", None, "intron_variant"]),
+            "Gene": ["GENE1", "GENE2", "GENE3", None],
+            "C4R_WES_counts": [3, 0, 100, 7],
+            "Quality": [55.5, np.nan, 2.5, 1000.0],
+        }
+    )
+    rows = report[SUMMARY_ARGUMENTS].to_numpy(dtype=object, na_value=np.nan)
+    expected = [variants.summary_field(*row) for row in rows]
+    assert variants.summary_fields(report).tolist() == expected
+
+
+def trio(rows):
+    # (position, gene, proband, mother, father) zygosities; the burden is the
+    # proband's variants per gene, as in C4R reports
+    report = pd.DataFrame(rows, columns=["Position", "Gene", "Zygosity.F1_P", "Zygosity.F1_M", "Zygosity.F1_D"])
+    report["Burden.F1_P"] = report.groupby("Gene")["Gene"].transform("size").astype("Int32")
+    report["omim_phenotype"] = "."
+    return report
+
+
+COMPOUND_HETS = trio(
+    [
+        # a maternal het before its gene's de novo het
+        ("1:100", "GENE1", "Het", "Het", "-"),
+        ("1:200", "GENE1", "Het", "-", "-"),
+        # a maternal het before its gene's paternal het
+        ("2:100", "GENE2", "Het", "Het", "-"),
+        ("2:200", "GENE2", "Het", "-", "Het"),
+        # two maternal hets are not a compound het
+        ("3:100", "GENE3", "Het", "Het", "-"),
+        ("3:200", "GENE3", "Het", "Het", "-"),
+        # a maternal het after its gene's de novo het
+        ("4:100", "GENE4", "Het", "-", "-"),
+        ("4:200", "GENE4", "Het", "-", "Het"),
+        ("4:300", "GENE4", "Het", "Het", "-"),
+        # a lone paternal het
+        ("5:100", "GENE5", "Het", "-", "Het"),
+    ]
+)
+
+
+def test_compound_het_keeps_variants_before_the_other_parent_or_de_novo():
+    tab = variants.compound_het(COMPOUND_HETS, "F1_P", "F1_M", "F1_D", "trio")
+    assert sorted(tab["Position"]) == ["1:100", "1:200", "2:100", "2:200", "4:100", "4:200", "4:300"]
+
+
+def test_compound_het_does_not_depend_on_row_order():
+    tab = variants.compound_het(COMPOUND_HETS, "F1_P", "F1_M", "F1_D", "trio")
+    for seed in range(5):
+        shuffled = COMPOUND_HETS.sample(frac=1, random_state=seed)
+        shuffled_tab = variants.compound_het(shuffled, "F1_P", "F1_M", "F1_D", "trio")
+        pd.testing.assert_frame_equal(shuffled_tab.sort_index(), tab.sort_index())
+
+
+# the per-tab filters classify replaced, as they were before it
+def filter_autosomal_recessive(variants_df, proband, mother, father, report_type):
+    zygosity = variants_df[variants.get_zygosity(proband)]
+    if report_type == "singleton":
+        return variants_df[(zygosity == "Hom") & ~variants_df["Position"].str.contains("X")]
+    return variants_df[
+        (zygosity == "Hom")
+        & (variants_df[variants.get_zygosity(mother)] == "Het")
+        & (variants_df[variants.get_zygosity(father)] == "Het")
+    ]
+
+
+def filter_hemizygous(variants_df, proband, mother, father, report_type):
+    hom = variants_df[variants_df[variants.get_zygosity(proband)] == "Hom"]
+    if report_type == "singleton":
+        return hom[hom["Position"].str.contains("X")]
+    mother_zygosity = hom[variants.get_zygosity(mother)]
+    father_zygosity = hom[variants.get_zygosity(father)]
+    return pd.concat(
+        [
+            hom[(mother_zygosity == "Het") & (father_zygosity == "-")],
+            hom[(mother_zygosity == "-") & (father_zygosity == "Het")],
+        ]
+    )
+
+
+def filter_denovo(variants_df, proband, mother, father):
+    return variants_df[
+        variants_df[variants.get_zygosity(proband)].isin(["Het", "Hom"])
+        & (variants_df[variants.get_zygosity(mother)] == "-")
+        & (variants_df[variants.get_zygosity(father)] == "-")
+    ]
+
+
+def filter_compound_het(variants_df, proband, mother, father, report_type):
+    burdened = variants_df[variants_df[variants.get_burden(proband)] >= 2]
+    het = burdened[variants.get_zygosity(proband)] == "Het"
+    if report_type == "trio":
+        mother_zygosity = burdened[variants.get_zygosity(mother)]
+        father_zygosity = burdened[variants.get_zygosity(father)]
+        maternal = (mother_zygosity == "Het") & (father_zygosity == "-")
+        paternal = (father_zygosity == "Het") & (mother_zygosity == "-")
+        de_novo = het & (mother_zygosity == "-") & (father_zygosity == "-")
+        genes = burdened["Gene"]
+        het &= genes.isin((set(genes[maternal]) & set(genes[paternal])) | set(genes[de_novo]))
+    return burdened[het]
+
+
+def filter_dominant_OMIM(variants_df, proband):
+    omim_phenotype = variants_df["omim_phenotype"]
+    return variants_df[
+        (omim_phenotype != ".")
+        & omim_phenotype.notnull()
+        & (variants_df[variants.get_zygosity(proband)] == "Het")
+    ]
+
+
+def filter_dominant_nonOMIM(variants_df, proband):
+    omim_phenotype = variants_df["omim_phenotype"]
+    return variants_df[
+        (variants_df[variants.get_zygosity(proband)] == "Het")
+        & (omim_phenotype.isnull() | (omim_phenotype == "."))
+    ]
+
+
+def filter_panel(variants_df, proband):
+    return variants_df[
+        variants_df[variants.get_zygosity(proband)].isin(["Het", "Hom"])
+        & variants_df["Panels"].notnull()
+    ]
+
+
+def same_rows(tab, expected):
+    # ties in the sort columns may be ordered either way, so compare the rows
+    # sorted by every column
+    def rows(frame):
+        return frame.sort_values(list(frame.columns), kind="stable").reset_index(drop=True)
+
+    assert len(tab) > 0
+    pd.testing.assert_frame_equal(rows(tab), rows(expected))
+
+
+def test_classify_matches_per_tab_filters_for_a_singleton(tmp_path):
+    path = synthetic_report.make_report(str(tmp_path / "report.csv"), 3000, "singleton", seed=2)
+    report = reader.read_report(path)
+    proband = variants.parse_id(synthetic_report.FAMILY_ID, synthetic_report.PROBAND_ID)
+    categories = variants.classify(report, proband, None, None, "singleton")
+    for tab, expected in [
+        (variants.autosomal_recessive, filter_autosomal_recessive),
+        (variants.hemizygous, filter_hemizygous),
+        (variants.compound_het, filter_compound_het),
+    ]:
+        same_rows(
+            tab(report, proband, None, None, "singleton", categories),
+            expected(report, proband, None, None, "singleton"),
+        )
+    for tab, expected in [
+        (variants.dominant_OMIM, filter_dominant_OMIM),
+        (variants.dominant_nonOMIM, filter_dominant_nonOMIM),
+        (variants.panel, filter_panel),
+    ]:
+        same_rows(tab(report, proband, categories), expected(report, proband))
+
+
+def test_classify_matches_per_tab_filters_for_a_trio(tmp_path):
+    path = synthetic_report.make_report(str(tmp_path / "report.csv"), 3000, "trio", seed=2)
+    report = reader.read_report(path)
+    proband, mother, father = [
+        variants.parse_id(synthetic_report.FAMILY_ID, sample)
+        for sample in synthetic_report.sample_ids("trio")
+    ]
+    categories = variants.classify(report, proband, mother, father, "trio")
+    for tab, expected in [
+        (variants.autosomal_recessive, filter_autosomal_recessive),
+        (variants.hemizygous, filter_hemizygous),
+        (variants.compound_het, filter_compound_het),
+    ]:
+        same_rows(
+            tab(report, proband, mother, father, "trio", categories),
+            expected(report, proband, mother, father, "trio"),
+        )
+    same_rows(
+        variants.denovo(report, proband, mother, father, categories),
+        filter_denovo(report, proband, mother, father),
+    )
+    for tab, expected in [
+        (variants.dominant_OMIM, filter_dominant_OMIM),
+        (variants.dominant_nonOMIM, filter_dominant_nonOMIM),
+        (variants.panel, filter_panel),
+    ]:
+        same_rows(tab(report, proband, categories), expected(report, proband))
@@ -0,0 +1,54 @@
+from group_variants import variants, vcf
+import prioritize_variants
+
+HEADER = """\
+##fileformat=VCFv4.2
+##contig=<ID=1>
+##contig=<ID=2>
+##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations from Ensembl VEP. Format: Allele|Consequence|SYMBOL|HGVSc">
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tP\tM\tD
+"""
+
+
+def write_vcf(tmp_path, records):
+    path = tmp_path / "family.vcf"
+    path.write_text(HEADER + "".join("\t".join(record) + "\n" for record in records))
+    return str(path)
+
+
+def record(chrom, pos, info, proband, mother, father):
+    return [chrom, pos, ".", "A", "G", "500", "PASS", info, "GT", proband, mother, father]
+
+
+def test_unannotated_variants_are_not_one_gene(tmp_path):
+    # unrelated het variants without a gene, one from each parent
+    path = write_vcf(
+        tmp_path,
+        [
+            record("1", "100", ".", "0/1", "0/1", "0/0"),
+            record("1", "5000", ".", "0/1", "0/0", "0/1"),
+            record("2", "300", ".", "0/1", "0/0", "0/0"),
+        ],
+    )
+    report = vcf.read_vcf(path, "F1")
+    assert report["Gene"].tolist() == [".", ".", "."]
+    assert report["Burden.F1_P"].tolist() == [1, 1, 1]
+    assert report["Burden.F1_M"].tolist() == [1, 0, 0]
+
+    tabs = prioritize_variants.prioritize(report, "P", "trio", "F1", "M", "D")
+    assert len(tabs["Compound_heterozygous"]) == 0
+
+
+def test_annotated_variants_count_per_gene(tmp_path):
+    path = write_vcf(
+        tmp_path,
+        [
+            record("1", "100", "CSQ=G|missense_variant|GENE1|c.1A>G", "0/1", "0/1", "0/0"),
+            record("1", "5000", "CSQ=G|missense_variant|GENE1|c.2A>G", "0/1", "0/0", "0/1"),
+            record("2", "300", ".", "0/1", "0/0", "0/0"),
+        ],
+    )
+    report = vcf.read_vcf(path, "F1")
+    assert report["Burden.F1_P"].tolist() == [2, 2, 1]
+    categories = variants.classify(report, "F1_P", "F1_M", "F1_D", "trio")
+    assert (categories[:2] & variants.COMPOUND_HET).all()
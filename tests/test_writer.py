@@ -0,0 +1,39 @@
+import pandas as pd
+from group_variants import views, writer
+
+
+def read_sheets(path):
+    # sheet name to its DataFrame, in workbook order
+    return pd.read_excel(path, sheet_name=None, dtype=str)
+
+
+def test_rows_past_the_limit_continue_on_new_sheets(tmp_path, monkeypatch):
+    # room for a header and three rows per sheet
+    monkeypatch.setattr(writer, "MAX_ROWS", 4)
+    frame = pd.DataFrame({"Position": ["1:%d" % i for i in range(8)], "Gene": "GENE1"})
+    path = str(tmp_path / "report.xlsx")
+    workbook = writer.open_workbook(path)
+    sheet = writer.SheetWriter(workbook, "Tab", frame.columns)
+    sheet.append(frame.iloc[:5])
+    sheet.append(views.RowView(frame, [5, 6, 7]))
+    workbook.close()
+
+    assert sheet.rows == [3, 3, 2]
+    sheets = read_sheets(path)
+    assert list(sheets) == ["Tab", "Tab_2", "Tab_3"]
+    assert [len(tab) for tab in sheets.values()] == [3, 3, 2]
+    pd.testing.assert_frame_equal(
+        pd.concat(sheets.values(), ignore_index=True), frame, check_dtype=False
+    )
+
+
+def test_split_sheet_names_fit_the_sheet_name_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(writer, "MAX_ROWS", 2)
+    frame = pd.DataFrame({"Position": ["1:1", "1:2"]})
+    path = str(tmp_path / "report.xlsx")
+    workbook = writer.open_workbook(path)
+    sheet = writer.write_frame(workbook, "x" * writer.MAX_SHEET_NAME, frame)
+    workbook.close()
+
+    assert sheet.rows == [1, 1]
+    assert list(read_sheets(path)) == ["x" * 31, "x" * 29 + "_2"]